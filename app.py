@@ -1,11 +1,12 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
+import sys
 import numpy as np
-import dill
 from scipy.stats import pearsonr
 from pathlib import Path
 from sklearn.cluster import KMeans
+from dataset_schema import LISTING_SCHEMA, UMP_SCHEMA, read_dataset
 
 # --- PATH SETTINGS ---
 current_dir = Path(__file__).parent if "__file__" in locals() else Path.cwd()
@@ -15,6 +16,9 @@ cleaned_population_data = current_dir / "datasets" / "cleaned_population_data.cs
 cleaned_income_province = current_dir / "datasets" / "cleaned_ump_data.csv"
 cleaned_rumah_tangga = current_dir / "datasets" / "cleaned_rumah_tangga_data.csv"
 cluster = current_dir / "datasets" / "cluster.csv"
+compact_model_dir = current_dir / "machine_learning" / "rf_regressor_model_compact"
+sys.path.append(str(current_dir / "machine_learning"))
+from inference import feature_schema_filename, load_predictor
 
 # --- SET PAGE CONFIG ---
 st.set_page_config(
@@ -30,11 +34,24 @@ with open(css_file) as f:
 
 
 # --- CREATE A DATAFRAME ---
-df_house = pd.read_csv(cleaned_listing_data)
-df_population = pd.read_csv(cleaned_population_data)
-df_income = pd.read_csv(cleaned_income_province)
-df_rt = pd.read_csv(cleaned_rumah_tangga)
-df_cluster = pd.read_csv(cluster)
+# The datasets are memory-mapped from their Feather files, and only the columns the charts use are read.
+# They are joined on the integer code of the province, "provinsi_id", and the names come from one side only
+df_house = read_dataset(cleaned_listing_data, LISTING_SCHEMA, columns=['provinsi_id', 'harga'])
+df_population = read_dataset(cleaned_population_data)
+df_income = read_dataset(cleaned_income_province, UMP_SCHEMA)
+df_rt = read_dataset(cleaned_rumah_tangga)
+df_cluster = read_dataset(cluster)
+
+
+# --- LOAD MODEL ---
+@st.cache_resource
+def load_price_model():
+    """This function loads the compact price model and its feature schema once per process, for every session.
+
+    Its trees are memory-mapped, so loading takes milliseconds and only the nodes that the predictions
+    visit are read from the disk.
+    """
+    return load_predictor(compact_model_dir)
 
 
 # --- TITLE ---
@@ -84,16 +101,17 @@ sum_values = {column: df_rt[column].sum() for column in columns_to_sum}
 # Add 'provinsi' to the dictionary
 sum_values['provinsi'] = 'Indonesia'
 
-# Add a new row with the calculated sums
-df_rt.loc[len(df_rt)] = sum_values
+# Add a new row with the calculated sums. It has no 'provinsi_id' and only goes in the frame of the chart,
+# so df_rt keeps one row per province when it is merged on 'provinsi_id' below
+df_rt_chart = pd.concat([df_rt, pd.DataFrame([sum_values])], ignore_index=True)
 
 col_grafik1, col_grafik2, col_grafik3 = st.columns(3)
 with col_grafik2:
     # Create a selectbox for 'provinsi'
-    selected_provinsi = st.selectbox('', df_rt['provinsi'].unique(), index=df_rt['provinsi'].unique().tolist().index('Indonesia'))
+    selected_provinsi = st.selectbox('', df_rt_chart['provinsi'].unique(), index=df_rt_chart['provinsi'].unique().tolist().index('Indonesia'))
 
     # Filter the DataFrame based on the selected 'provinsi'
-    df_filtered = df_rt[df_rt['provinsi'] == selected_provinsi]
+    df_filtered = df_rt_chart[df_rt_chart['provinsi'] == selected_provinsi]
 
     # Create a DataFrame for the pie chart
     df_pie = pd.DataFrame({
@@ -151,20 +169,20 @@ st.markdown("<br>", unsafe_allow_html=True)
 st.markdown("<h2 style='text-align: left; font-size: 44px;'>Analisis Hubungan Jumlah Rumah yang Dijual di Setiap Provinsi Indonesia dengan Beberapa Parameter Terkait</h2>", unsafe_allow_html=True)
 
 # Amount of house in each province
-province_amount_house = df_house.groupby('provinsi').agg(amount_house = ('provinsi','count'))
+province_amount_house = df_house.groupby('provinsi_id').agg(amount_house = ('provinsi_id','count'))
 
 # Sorting by the 'amount_house' column in descending order
 province_amount_house_sorted = province_amount_house.sort_values(by='amount_house', ascending=False)
 
-# Merge df_population with province_amount_house based on the 'provinsi' column using an inner join
-amount_population = pd.merge(province_amount_house, df_population, on='provinsi', how='inner')
+# Merge df_population with province_amount_house based on the 'provinsi_id' column using an inner join
+amount_population = pd.merge(province_amount_house, df_population, on='provinsi_id', how='inner')
 
 # Sort the merged dataframe based on the 'amount_house' column in descending order
 amount_population_sorted = amount_population.sort_values(by='amount_house', ascending=False)
 
-# Merge amount_population_sorted with df_rt based on the 'provinsi' column using an inner join
-df_rt_amount_house = pd.merge(amount_population_sorted, df_rt, on='provinsi', how='inner')
-df_rt_amount_house = pd.merge(df_rt_amount_house, df_income, on='provinsi', how='inner')
+# Merge amount_population_sorted with df_rt based on the 'provinsi_id' column using an inner join
+df_rt_amount_house = pd.merge(amount_population_sorted, df_rt.drop(columns='provinsi'), on='provinsi_id', how='inner')
+df_rt_amount_house = pd.merge(df_rt_amount_house, df_income.drop(columns='provinsi'), on='provinsi_id', how='inner')
 
 # Transform the 'nilai_awal' column to base 10 logarithm
 df_rt_amount_house['jumlah_penduduk_log'] = np.log10(df_rt_amount_house['jumlah_penduduk'])
@@ -350,14 +368,14 @@ st.markdown("<h2 style='text-align: left; font-size: 44px;'>Analisis Kesenjangan
 st.markdown("<br>", unsafe_allow_html=True)
 
 # Median house price in each province
-province_price = df_house.groupby('provinsi').agg(median_price = ('harga','median'))
+province_price = df_house.groupby('provinsi_id').agg(median_price = ('harga','median'))
 # st.dataframe(province_price)
 
 # Sorting by the 'median_price' column in descending order
 province_price_sorted = province_price.sort_values(by='median_price', ascending=False)
 
 # Merging province_price and df_income
-ump_merge = pd.merge(province_price, df_income, on='provinsi', how='inner')
+ump_merge = pd.merge(province_price, df_income, on='provinsi_id', how='inner')
 
 # Sorting DataFrame based on ump column in descending order
 ump_merge_sorted = ump_merge.sort_values(by='ump', ascending=False)
@@ -396,7 +414,7 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-cluster_income = pd.merge(df_income, df_cluster, on='provinsi', how='inner')
+cluster_income = pd.merge(df_income, df_cluster.drop(columns='provinsi'), on='provinsi_id', how='inner')
 cluster_income['ump_log'] = np.log10(cluster_income['ump'])
 
 # Create a dict for mapping the cluster column
@@ -639,111 +657,85 @@ st.markdown("<br>", unsafe_allow_html=True)
 
 
 
-# # Machine Learning
-# st.markdown("<h2 style='text-align: center; font-size: 44px;'>Prediksi Harga Real Estate Anda Di Sini.</h2>", unsafe_allow_html=True)
-# st.markdown("<br>", unsafe_allow_html=True)
-# df_house_baru = df_house.copy()
-
-# col1, col2, col3 = st.columns(3)
-
-# # Removing houses that have a price under 50 million
-# df_house_baru = df_house_baru[df_house_baru['harga'] >= 50000000]
-
-# # Drop columns
-# df_house_baru = df_house_baru.drop(['kecamatan'], axis=1)
-
-# with col2:
-#     # Displaying a warning message  
-#     st.warning("Peringatan: Proses ini dapat memakan waktu yang bervariasi bergantung pada kecepatan internet Anda. Mohon maaf atas segala ketidaknyamanan yang mungkin timbul.", icon="⚠️")
-#     st.markdown("<br>", unsafe_allow_html=True)  
-
-#     # Create select box for provinsi
-#     provinsi_options = sorted(df_house_baru['provinsi'].unique())
-#     selected_provinsi = st.selectbox('Pilih Provinsi', provinsi_options)
-
-#     # Filter DataFrame based on provinsi
-#     filtered_df_province = df_house_baru[df_house_baru['provinsi'] == selected_provinsi]
-
-#     # create select box for kota based on provinsi
-#     kota_options = sorted(filtered_df_province['kota'].unique())
-#     selected_kota = st.selectbox('Pilih Kota', kota_options)
-
-#     # Create input boxes for kamar_tidur
-#     kamar_tidur = st.number_input('Masukkan Jumlah Kamar Tidur', value=0, step=1)
-#     kamar_tidur = max(0, int(kamar_tidur))  # Ensure the value is at least 0
-
-#     # Do the same for kamar_mandi, luas_tanah, and luas_bangunan
-#     kamar_mandi = max(0, int(st.number_input('Masukkan Jumlah Kamar Mandi', value=0, step=1)))
-#     luas_tanah = max(0, int(st.number_input('Masukkan Luas Tanah (Meter Persegi)', value=0.0, step=1.0)))
-#     luas_bangunan = max(0, int(st.number_input('Masukkan Luas Bangunan (Meter Persegi)', value=0.0, step=1.0)))
-
-#     # Check if all values are greater than 0 and luas_bangunan is not greater than luas_tanah
-#     if kamar_tidur > 0 and kamar_mandi > 0 and luas_tanah > 0 and luas_bangunan > 0 and luas_bangunan <= luas_tanah:
-#         # Create a dictionary with the selected values
-#         new_data = {
-#             'kota': [selected_kota],
-#             'provinsi': [selected_provinsi],
-#             'kamar_tidur': [kamar_tidur],
-#             'kamar_mandi': [kamar_mandi],
-#             'luas_tanah': [luas_tanah],
-#             'luas_bangunan': [luas_bangunan]
-#         }
-
-#         # Create a new DataFrame with the new data
-#         new_row_df = pd.DataFrame(new_data)
-
-#         # Append the new row to the original DataFrame
-#         new_data = df_house_baru.drop(['harga'], axis=1)
-#         df_machine_learning = pd.concat([new_row_df, new_data], ignore_index=True)
-
-#         # Performing one-hot encoding
-#         df_machine_learning = pd.get_dummies(df_machine_learning, columns=[ 'provinsi', 'kota'])
-#         df_machine_learning = df_machine_learning[:1]
-
-#         # setup load model
-#         model_path = current_dir / "machine_learning" / "rf_regressor_model.pkl"
-        
-#         # Load the pickled model
-#         with open(model_path, 'rb') as file:
-#             load_model = dill.load(file)
-
-#         # Make prediction
-#         prediction = load_model.predict(df_machine_learning)
-
-#         # Round the prediction to 2 decimal places
-#         rounded_prediction = round(prediction[0], 2)
-
-#         # Format the rounded prediction with thousands separator
-#         formatted_prediction = "{:,.2f}".format(rounded_prediction)
-
-#         # Displaying prediction as text
-#         st.markdown("<br>", unsafe_allow_html=True)
-#         st.markdown("""
-#             <div>
-#                 <p style="text-align: center; font-size: 24px;">
-#                     ESTIMASI HARGA REAL ESTATE ANDA ADALAH
-#                 </p>
-#             </div>
-#         """, unsafe_allow_html=True)
-
-#         st.markdown("""
-#         <div style="margin-top: 20px;">
-#             <h3 style="text-align: center; font-size: 39px;">
-#                 <span style="background-color: #f5f5f5; padding: 15px; border-radius: 10px; color: #262626;">
-#                     <strong>Rp. {}</strong>
-#                 </span>
-#             </h3>
-#         </div>
-#         """.format(formatted_prediction), unsafe_allow_html=True)
-#         st.markdown("<br>", unsafe_allow_html=True)
-
-#     else:
-#         st.warning("Dimohon untuk memasukkan angka di atas 0 pada Kamar Tidur, Kamar Mandi, Luas Tanah, dan Luas Bangunan. Pastikan juga Luas Bangunan tidak lebih besar dari Luas Tanah.", icon="⚠️")
-    
+# Machine Learning
+st.markdown("<h2 style='text-align: center; font-size: 44px;'>Prediksi Harga Real Estate Anda Di Sini.</h2>", unsafe_allow_html=True)
+st.markdown("<br>", unsafe_allow_html=True)
+
+col1, col2, col3 = st.columns(3)
 
-# # Displaying a warning message  
-# st.markdown("<br>", unsafe_allow_html=True)    
-# st.warning("Tolong diingat, hasil prediksi harga rumah dari model machine learning ini hanyalah perkiraan berdasarkan data yang ada. Keputusan terkait pembelian atau penjualan rumah sebaiknya tetap dipertimbangkan dengan hati-hati dan disertai dengan penelitian lebih lanjut. Model ini tidak dapat memperhitungkan faktor-faktor yang mungkin tidak terdokumentasi dalam data, dan keputusan akhir sebaiknya didasarkan pada pemahaman menyeluruh tentang pasar dan kondisi spesifik properti yang bersangkutan. Selalu konsultasikan dengan profesional real estate sebelum mengambil keputusan besar terkait properti.", icon="⚠️")
+with col2:
+    if not (compact_model_dir / feature_schema_filename).exists():
+        st.info("Model belum tersedia. Jalankan machine_learning.py untuk melatih model dan menyimpan rf_regressor_model_compact.", icon="ℹ️")
+    else:
+        # Load the compact model and its feature schema, only once per process
+        price_model = load_price_model()
+
+        # Create select box for provinsi, with the provinces and cities the model was trained on
+        provinsi_options = list(price_model.schema.cities)
+        selected_provinsi = st.selectbox('Pilih Provinsi', provinsi_options)
+
+        # create select box for kota based on provinsi
+        kota_options = price_model.schema.cities[selected_provinsi]
+        selected_kota = st.selectbox('Pilih Kota', kota_options)
+
+        # Create input boxes for kamar_tidur
+        kamar_tidur = st.number_input('Masukkan Jumlah Kamar Tidur', value=0, step=1)
+        kamar_tidur = max(0, int(kamar_tidur))  # Ensure the value is at least 0
+
+        # Do the same for kamar_mandi, luas_tanah, and luas_bangunan
+        kamar_mandi = max(0, int(st.number_input('Masukkan Jumlah Kamar Mandi', value=0, step=1)))
+        luas_tanah = max(0, int(st.number_input('Masukkan Luas Tanah (Meter Persegi)', value=0.0, step=1.0)))
+        luas_bangunan = max(0, int(st.number_input('Masukkan Luas Bangunan (Meter Persegi)', value=0.0, step=1.0)))
+
+        # Check if all values are greater than 0 and luas_bangunan is not greater than luas_tanah
+        if kamar_tidur > 0 and kamar_mandi > 0 and luas_tanah > 0 and luas_bangunan > 0 and luas_bangunan <= luas_tanah:
+            # The features of the listing are built from the feature schema, without the listing data
+            new_data = {
+                'kota': selected_kota,
+                'provinsi': selected_provinsi,
+                'kamar_tidur': kamar_tidur,
+                'kamar_mandi': kamar_mandi,
+                'luas_tanah': luas_tanah,
+                'luas_bangunan': luas_bangunan
+            }
+
+            # Make prediction
+            prediction = price_model.predict(new_data)
+
+            # Round the prediction to 2 decimal places
+            rounded_prediction = round(prediction[0], 2)
+
+            # Format the rounded prediction with thousands separator
+            formatted_prediction = "{:,.2f}".format(rounded_prediction)
+
+            # Displaying prediction as text
+            st.markdown("<br>", unsafe_allow_html=True)
+            st.markdown("""
+                <div>
+                    <p style="text-align: center; font-size: 24px;">
+                        ESTIMASI HARGA REAL ESTATE ANDA ADALAH
+                    </p>
+                </div>
+            """, unsafe_allow_html=True)
+
+            st.markdown("""
+            <div style="margin-top: 20px;">
+                <h3 style="text-align: center; font-size: 39px;">
+                    <span style="background-color: #f5f5f5; padding: 15px; border-radius: 10px; color: #262626;">
+                        <strong>Rp. {}</strong>
+                    </span>
+                </h3>
+            </div>
+            """.format(formatted_prediction), unsafe_allow_html=True)
+            st.markdown("<br>", unsafe_allow_html=True)
+
+        else:
+            st.warning("Dimohon untuk memasukkan angka di atas 0 pada Kamar Tidur, Kamar Mandi, Luas Tanah, dan Luas Bangunan. Pastikan juga Luas Bangunan tidak lebih besar dari Luas Tanah.", icon="⚠️")
+
+
+# Displaying a warning message
+st.markdown("<br>", unsafe_allow_html=True)
+st.warning("Tolong diingat, hasil prediksi harga rumah dari model machine learning ini hanyalah perkiraan berdasarkan data yang ada. Keputusan terkait pembelian atau penjualan rumah sebaiknya tetap dipertimbangkan dengan hati-hati dan disertai dengan penelitian lebih lanjut. Model ini tidak dapat memperhitungkan faktor-faktor yang mungkin tidak terdokumentasi dalam data, dan keputusan akhir sebaiknya didasarkan pada pemahaman menyeluruh tentang pasar dan kondisi spesifik properti yang bersangkutan. Selalu konsultasikan dengan profesional real estate sebelum mengambil keputusan besar terkait properti.", icon="⚠️")
 
 # Citation
 st.markdown("<br>", unsafe_allow_html=True)
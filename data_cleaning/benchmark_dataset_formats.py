@@ -0,0 +1,72 @@
+# Initialize library
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from province_resolver import PROVINCE_CITIES
+
+# --- PATH SETTINGS ---
+current_dir = Path(__file__).parent if "__file__" in locals() else Path.cwd()
+previous_dir = current_dir.parent
+sys.path.append(str(previous_dir))
+from dataset_schema import LISTING_SCHEMA, apply_schema, columnar_path, read_dataset, write_dataset
+from province_dimension import add_province_codes
+
+# --- CONFIG ---
+# Rows of the current cleaned listing data, the benchmark loads 10x and 100x as many
+base_rows = 100_000
+scales = [10, 100]
+seed = 28
+
+
+def synthetic_listings(num_rows, seed):
+    """This function generates a cleaned listing dataset with the schema and the value ranges of the real one."""
+    generator = np.random.default_rng(seed)
+    cities = [(city, province) for province, province_cities in PROVINCE_CITIES.items() for city in province_cities]
+    city = generator.integers(len(cities), size=num_rows)
+    df = pd.DataFrame({
+        'kecamatan': pd.Categorical.from_codes(generator.integers(2000, size=num_rows),
+                                               [f"Kecamatan {number}" for number in range(2000)]),
+        'kota': pd.Categorical.from_codes(city, [name for name, _ in cities]).astype(str),
+        'provinsi': [cities[code][1] for code in city],
+        'kamar_tidur': generator.integers(1, 8, size=num_rows),
+        'kamar_mandi': generator.integers(1, 6, size=num_rows),
+        'luas_tanah': generator.integers(60, 1000, size=num_rows),
+        'luas_bangunan': generator.integers(30, 600, size=num_rows),
+        'harga': generator.integers(100, 20000, size=num_rows) * 1_000_000,
+    })
+    return apply_schema(add_province_codes(df), LISTING_SCHEMA)
+
+
+def timed(function):
+    start_time = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start_time
+
+
+if __name__ == "__main__":
+    # python benchmark_dataset_formats.py [scale,scale,...]
+    if len(sys.argv) > 1:
+        scales = [int(scale) for scale in sys.argv[1].split(',')]
+
+    print(f"{'rows':>10}{'CSV MB':>9}{'Feather MB':>12}{'read_csv':>10}{'CSV+schema':>12}{'Feather':>9}"
+          f"{'2 columns':>11}")
+    for scale in scales:
+        num_rows = base_rows * scale
+        with tempfile.TemporaryDirectory() as work_dir:
+            csv_path = Path(work_dir) / "cleaned_listing_data.csv"
+            write_dataset(synthetic_listings(num_rows, seed), csv_path)
+
+            # read_csv is how the datasets were read before, the others go through read_dataset. The projected read
+            # takes the columns of app.py, which groups the prices by the code of the province
+            _, plain_seconds = timed(lambda: pd.read_csv(csv_path))
+            _, csv_seconds = timed(lambda: pd.read_csv(csv_path, dtype=LISTING_SCHEMA))
+            df, feather_seconds = timed(lambda: read_dataset(csv_path, LISTING_SCHEMA))
+            _, projected_seconds = timed(lambda: read_dataset(csv_path, LISTING_SCHEMA, columns=['provinsi_id', 'harga']))
+            assert len(df) == num_rows and df.dtypes.astype(str).to_dict() == LISTING_SCHEMA
+
+            print(f"{num_rows:>10}{csv_path.stat().st_size / 2 ** 20:>9.1f}"
+                  f"{columnar_path(csv_path).stat().st_size / 2 ** 20:>12.1f}{plain_seconds:>9.2f}s"
+                  f"{csv_seconds:>11.2f}s{feather_seconds:>8.2f}s{projected_seconds:>10.2f}s")
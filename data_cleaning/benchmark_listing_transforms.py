@@ -0,0 +1,91 @@
+# Initialize library
+import random
+import re
+import time
+import numpy as np
+import pandas as pd
+from listing_transforms import LOKASI_PATTERN, parse_numbers, split_lokasi
+
+# --- CONFIG ---
+# Number of rows of the synthetic "lokasi" column, the listing dumps have more than 100k rows
+num_rows = 500_000
+seed = 28
+
+kecamatan_names = ['Cibinong', 'Sawangan', 'Lubuk Pakam', 'Kebayoran Baru', 'Tembalang', 'Ngaglik', 'Medan Johor']
+kota_names = ['Bogor', 'Depok', 'Deli Serdang', 'Jakarta Selatan', 'Semarang', 'Sleman', 'Medan']
+
+
+def synthetic_lokasi(num_rows, seed):
+    """This function generates "Kecamatan, Kota" values, with some of the malformed values of the real dumps."""
+    generator = random.Random(seed)
+    values = []
+    for i in range(num_rows):
+        kecamatan, kota = generator.choice(kecamatan_names), generator.choice(kota_names)
+        if i % 50 == 0:
+            values.append(kota)
+        elif i % 75 == 0:
+            values.append(f"{kecamatan},")
+        elif i % 90 == 0:
+            values.append(f"{kecamatan}, {kota}, Indonesia")
+        else:
+            values.append(f"{kecamatan}, {kota}")
+    return pd.Series(values, name='lokasi')
+
+
+def synthetic_harga(num_rows, seed):
+    """This function generates "harga" values, some of them without a price."""
+    generator = random.Random(seed)
+    return pd.Series(["Kontak agen untuk harga" if i % 20 == 0 else f"Rp {generator.randint(100, 20000) * 10 ** 6:,}"
+                      .replace(',', '.') for i in range(num_rows)], name='harga')
+
+
+def parse_harga_replace(harga):
+    """This function is the price parsing of cleaning_listing_data.py before parse_numbers."""
+    harga = harga[harga != 'Kontak agen untuk harga']
+    return pd.to_numeric(harga.str.replace('Rp', '').str.replace('.', ''))
+
+
+def split_lokasi_apply(lokasi):
+    """This function is the row by row version of cleaning_listing_data.py before split_lokasi."""
+    kecamatan = lokasi.apply(lambda x: re.findall(r'([^,]+),', x)[0] if re.findall(r'([^,]+),', x) else '')
+    kota = lokasi.apply(lambda x: re.findall(r',\s*([^,]+)', x)[0] if re.findall(r',\s*([^,]+)', x) else '')
+    return pd.DataFrame({'kecamatan': kecamatan, 'kota': kota})
+
+
+if __name__ == "__main__":
+    lokasi = synthetic_lokasi(num_rows, seed)
+
+    start_time = time.perf_counter()
+    expected = split_lokasi_apply(lokasi)
+    apply_seconds = time.perf_counter() - start_time
+
+    # The path of split_lokasi without pyarrow
+    start_time = time.perf_counter()
+    pandas_result = lokasi.str.extract(LOKASI_PATTERN).fillna('')
+    pandas_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    result = split_lokasi(lokasi)
+    vectorized_seconds = time.perf_counter() - start_time
+
+    pd.testing.assert_frame_equal(pandas_result, expected)
+    pd.testing.assert_frame_equal(result, expected)
+    print(f"{num_rows} rows, all versions give the same kecamatan and kota")
+    print(f"apply with re.findall:     {apply_seconds:.2f} seconds")
+    print(f"str.extract, one pass:     {pandas_seconds:.2f} seconds ({apply_seconds / pandas_seconds:.1f}x faster)")
+    print(f"split_lokasi with pyarrow: {vectorized_seconds:.2f} seconds ({apply_seconds / vectorized_seconds:.1f}x faster)")
+
+    harga = synthetic_harga(num_rows, seed)
+
+    start_time = time.perf_counter()
+    expected = parse_harga_replace(harga)
+    replace_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    values, valid = parse_numbers(harga)
+    parse_seconds = time.perf_counter() - start_time
+
+    np.testing.assert_array_equal(values[valid], expected.to_numpy())
+    print(f"{num_rows} prices, both versions give the same numbers")
+    print(f"str.replace, to_numeric:   {replace_seconds:.2f} seconds")
+    print(f"parse_numbers:             {parse_seconds:.2f} seconds ({replace_seconds / parse_seconds:.1f}x faster)")
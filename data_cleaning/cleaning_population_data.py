@@ -1,4 +1,5 @@
 # Initialize library
+import sys
 import pandas as pd
 from pathlib import Path
 
@@ -8,6 +9,9 @@ pd.set_option('display.max_columns', None)
 # --- PATH SETTINGS ---
 current_dir = Path(__file__).parent if "__file__" in locals() else Path.cwd()
 previous_dir = current_dir.parent
+sys.path.append(str(previous_dir))
+from dataset_schema import write_dataset
+from province_dimension import add_province_codes
 
 # Create a DataFrame
 population_data_path = current_dir / "population_data.csv"
@@ -16,10 +20,13 @@ df = pd.read_csv(population_data_path, delimiter=',')
 # Convert the data type of the "jumlah_penduduk" column to numeric
 jumlah_penduduk = df.copy()
 jumlah_penduduk['jumlah_penduduk'] = pd.to_numeric(jumlah_penduduk['jumlah_penduduk'])
+
+# Canonical province names and their codes
+jumlah_penduduk = add_province_codes(jumlah_penduduk)
 print(jumlah_penduduk.info())
 print(jumlah_penduduk)
 
-# Saving to CSV file
+# Saving to CSV file and to a Feather file next to it
 output_dir = previous_dir / "datasets"
 cleaned_population_data_path = output_dir / "cleaned_population_data.csv"
-jumlah_penduduk.to_csv(cleaned_population_data_path, index=False)
+write_dataset(jumlah_penduduk, cleaned_population_data_path)
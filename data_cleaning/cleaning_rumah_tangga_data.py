@@ -1,6 +1,6 @@
 # Initialize library
+import sys
 import pandas as pd
-import re
 from pathlib import Path
 
 # Set the maximum number of rows and columns to be displayed
@@ -9,6 +9,9 @@ pd.set_option('display.max_columns', None)
 # --- PATH SETTINGS ---
 current_dir = Path(__file__).parent if "__file__" in locals() else Path.cwd()
 previous_dir = current_dir.parent
+sys.path.append(str(previous_dir))
+from dataset_schema import write_dataset
+from province_dimension import add_province_codes
 
 # Create a DataFrame
 total_rumah_tangga_data_path = current_dir / "total_rumah_tangga_data.csv"
@@ -19,30 +22,17 @@ kepemilikan_rumah_data_path = current_dir / "kepemilikan_rumah_data.csv"
 df_pemilikan_rumah = pd.read_csv(kepemilikan_rumah_data_path, delimiter=',')
 df_pemilikan_rumah = df_pemilikan_rumah.rename(columns={'total': 'total_rt_no_house'})
 
-def process_string(df, column):
-    # Define a function to remove number, dot and space at the beginning of a string
-    # and capitalize the first letter of each word
-    def process_string_in_row(s):
-        s = re.sub(r'^\d+\.\s*', '', s)
-        if s == 'DKI JAKARTA':
-            return 'DKI Jakarta'
-        elif s == 'DI YOGYAKARTA':
-            return 'DI Yogyakarta'
-        else:
-            return s.title()
-
-    # Apply the function to every row in the column
-    df[column] = df[column].apply(process_string_in_row)
-
-process_string(df_rt, 'provinsi')
-process_string(df_pemilikan_rumah, 'provinsi')
-
-# Join the two dataframes
-df = pd.merge(df_pemilikan_rumah, df_rt, on='provinsi')
+# Canonical province names instead of "11. ACEH" or "31. DKI JAKARTA", and their codes
+df_rt = add_province_codes(df_rt)
+df_pemilikan_rumah = add_province_codes(df_pemilikan_rumah)
+
+# Join the two dataframes on the province codes
+df = pd.merge(df_pemilikan_rumah, df_rt.drop(columns='provinsi'), on='provinsi_id')
 df['total_rt_have_house'] = df['total_rt'] - df['total_rt_no_house']
 
 # Sorting the order of columns
-sorted_column = ['provinsi',
+sorted_column = ['provinsi_id',
+                 'provinsi',
                  'kontrak_sewa',
                  'bebas_sewa',
                  'lainnya',
@@ -52,7 +42,7 @@ sorted_column = ['provinsi',
 df = df[sorted_column]
 print(df)
 
-# Saving to CSV file
+# Saving to CSV file and to a Feather file next to it
 output_dir = previous_dir / "datasets"
 cleaned_rumah_tangga_data_path = output_dir / "cleaned_rumah_tangga_data.csv"
-df.to_csv(cleaned_rumah_tangga_data_path, index=False)
+write_dataset(df, cleaned_rumah_tangga_data_path)
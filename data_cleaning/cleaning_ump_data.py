@@ -1,4 +1,5 @@
 # Initialize library
+import sys
 import pandas as pd
 from pathlib import Path
 
@@ -8,6 +9,9 @@ pd.set_option('display.max_columns', None)
 # --- PATH SETTINGS ---
 current_dir = Path(__file__).parent if "__file__" in locals() else Path.cwd()
 previous_dir = current_dir.parent
+sys.path.append(str(previous_dir))
+from dataset_schema import UMP_SCHEMA, write_dataset
+from province_dimension import add_province_codes
 
 # Create a DataFrame
 ump_data_path = current_dir / "ump_data.csv"
@@ -23,13 +27,14 @@ df['ump'] = df['ump'].str.replace(',', '')
 # Convert the data type into float
 df['ump'] = df['ump'].astype(float)
 
-df['provinsi'] = df['provinsi'].replace('DI. Yogyakarta', 'DI Yogyakarta')
+# Canonical province names ("DI. Yogyakarta" is "DI Yogyakarta") and their codes
+df = add_province_codes(df)
 
 # Adding a new column with identical values (value=1620000)
 df['rata_rata_angsuran'] = 1620000
 print(df)
 
-# Saving to CSV file
+# Saving to CSV file and to a Feather file next to it
 output_dir = previous_dir / "datasets"
 cleaned_ump_data_path = output_dir / "cleaned_ump_data.csv"
-df.to_csv(cleaned_ump_data_path, index=False)
+write_dataset(df, cleaned_ump_data_path, UMP_SCHEMA)
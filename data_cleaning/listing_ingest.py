@@ -0,0 +1,105 @@
+# Initialize library
+import hashlib
+import json
+import time
+from multiprocessing import Pool
+from pathlib import Path
+import pandas as pd
+from listing_transforms import CLEAN_COLUMNS, clean_listings
+
+
+def file_digest(path):
+    """This function returns the SHA-256 of the content of a file, read in blocks of 1 MB."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(2 ** 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path):
+    """This function returns the manifest of the raw files that were cleaned before, by file name."""
+    manifest_path = Path(manifest_path)
+    return json.loads(manifest_path.read_text(encoding='utf-8')) if manifest_path.exists() else {}
+
+
+def save_manifest(manifest, manifest_path):
+    Path(manifest_path).write_text(json.dumps(manifest, indent=1, sort_keys=True), encoding='utf-8')
+
+
+def clean_raw_file(raw_path, part_path):
+    """This function cleans one house_scraping_pagination_{province}.csv file of the scraper into a part file.
+
+    The part keeps the digest of every raw row, so the duplicates between files can be removed when
+    the parts are merged. It returns the number of raw rows and of cleaned rows.
+    """
+    df = pd.read_csv(raw_path, delimiter=';', dtype=str)
+    # The row numbers of ROW_PATCHES belong to listing_data.csv, not to the scraper's files
+    df_clean = clean_listings(df, patches={}, keep_digests=True)
+    df_clean.reset_index(drop=True).to_feather(part_path)
+    return len(df), len(df_clean)
+
+
+def clean_raw_task(task):
+    """This function cleans one raw file in a worker process, and returns its manifest entry and its duration."""
+    name, sha256, raw_path, part_path = task
+    start_time = time.perf_counter()
+    rows, cleaned_rows = clean_raw_file(raw_path, part_path)
+    entry = {'sha256': sha256, 'rows': rows, 'cleaned_rows': cleaned_rows, 'part': Path(part_path).name}
+    return name, entry, time.perf_counter() - start_time
+
+
+def ingest(raw_paths, parts_dir, manifest_path, num_workers=1):
+    """This function cleans the raw files that are new or changed since the last run, and forgets removed ones.
+
+    A raw file is known by the SHA-256 of its content, recorded in the manifest with its number of
+    rows once its part is written. The files are independent, so with several workers every process
+    parses, filters, splits and resolves whole files, the biggest first, and only the small manifest
+    entries come back to the parent. It returns the manifest and the names of the cleaned files.
+    """
+    parts_dir = Path(parts_dir)
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(manifest_path)
+
+    raw_paths = {Path(raw_path).name: Path(raw_path) for raw_path in raw_paths}
+    for name in set(manifest) - set(raw_paths):
+        (parts_dir / manifest.pop(name)['part']).unlink(missing_ok=True)
+
+    tasks = []
+    for name, raw_path in sorted(raw_paths.items()):
+        sha256 = file_digest(raw_path)
+        part_path = parts_dir / (Path(name).stem + ".feather")
+        if manifest.get(name, {}).get('sha256') != sha256 or not part_path.exists():
+            tasks.append((name, sha256, raw_path, part_path))
+    # The biggest provinces take the longest, starting them first keeps all the workers busy until the end
+    tasks.sort(key=lambda task: task[2].stat().st_size, reverse=True)
+
+    cleaned = []
+
+    def record(results):
+        for done, (name, entry, seconds) in enumerate(results, start=1):
+            # The manifest is saved after every file, so an interrupted run does not clean it again
+            manifest[name] = entry
+            save_manifest(manifest, manifest_path)
+            cleaned.append(name)
+            print(f"[{done}/{len(tasks)}] {name}: {entry['rows']} rows read, {entry['cleaned_rows']} rows cleaned "
+                  f"in {seconds:.2f} seconds")
+
+    num_workers = min(num_workers, len(tasks))
+    if num_workers > 1:
+        with Pool(processes=num_workers) as pool:
+            record(pool.imap_unordered(clean_raw_task, tasks))
+    else:
+        record(map(clean_raw_task, tasks))
+
+    save_manifest(manifest, manifest_path)
+    return manifest, sorted(cleaned)
+
+
+def merge_parts(parts_dir, manifest):
+    """This function concatenates the parts of the manifest and removes the rows that are in several files."""
+    parts = [pd.read_feather(Path(parts_dir) / manifest[name]['part']) for name in sorted(manifest)]
+    if not parts:
+        return pd.DataFrame(columns=CLEAN_COLUMNS)
+    df = pd.concat(parts, ignore_index=True)
+    return df.loc[~df['digest'].duplicated()].drop(columns='digest').reset_index(drop=True)
@@ -0,0 +1,158 @@
+# Initialize library
+import re
+import numpy as np
+import pandas as pd
+from province_resolver import resolve_provinces
+
+# Columns of the listing data, and the columns of the cleaned listing data in their order
+NUMERIC_COLUMNS = ['kamar_tidur', 'kamar_mandi', 'luas_bangunan', 'luas_tanah']
+CLEAN_COLUMNS = ['kecamatan', 'kota', 'provinsi', 'kamar_tidur', 'kamar_mandi', 'luas_tanah', 'luas_bangunan', 'harga']
+
+# Largest value of every number, the maximum of its type in dataset_schema.LISTING_SCHEMA. A listing above it
+# is a typo of the listing ("40000" bedrooms) and is removed, so apply_schema never sees it
+NUMBER_LIMITS = {
+    'kamar_tidur': np.iinfo(np.int16).max,
+    'kamar_mandi': np.iinfo(np.int16).max,
+    'luas_bangunan': np.iinfo(np.int32).max,
+    'luas_tanah': np.iinfo(np.int32).max,
+    'harga': np.iinfo(np.int64).max,
+}
+
+# Rows whose "kecamatan" and "kota" are corrected by hand, by their row number in listing_data.csv
+ROW_PATCHES = {
+    90975: {'kecamatan': 'Lubuk Pakam', 'kota': 'Deli Serdang'},
+}
+
+# Splits "Kecamatan, Kota" in one pass. Both groups sit in a lookahead anchored at the start, so each one
+# finds the same text as its own search: the first text followed by a comma is the "kecamatan", and the
+# first text after a comma is the "kota"
+LOKASI_PATTERN = re.compile(r'^(?:(?=,*(?P<kecamatan>[^,]+),))?(?:(?=[^,]*,+\s*(?P<kota>[^,]+)))?')
+
+# The regular "Kecamatan, Kota" values, for the RE2 engine of pyarrow. The "kota" has to start right after
+# the comma or after one space, and with a character that Python's \s does not match, so both patterns
+# agree on every value this one matches
+LOKASI_FAST_PATTERN = r'^(?P<kecamatan>[^,]+), ?(?P<kota>[^,\s\pZ\x{0b}\x{1c}-\x{1f}\x{85}][^,]*)'
+
+# The numbers of the listing data as the listings write them: "3", "Rp 1.500.000", "Rp 850 Juta", "Rp 1,5 Miliar",
+# "90 m²" or "1.200 m2". A dot separates thousands, unless it is followed by one or two digits only, and a comma
+# separates the decimals. The pattern only uses syntax that RE2 (pyarrow) and Python's re read the same way,
+# and spells out the cases instead of (?i), which makes RE2 twice as slow
+NUMBER_PATTERN = (r'^[ \t\n\r\xa0]*(?:[Rr][Pp]\.?[ \t\n\r\xa0]*)?'
+                  r'(?P<integer>[0-9]+(?:\.[0-9]{3})+|[0-9]+)(?:,(?P<comma>[0-9]+)|\.(?P<dot>[0-9]{1,2}))?'
+                  r'[ \t\n\r\xa0]*(?P<unit>[Jj]uta|JUTA|[Jj]t|[Mm]il[iy]ar|MIL[IY]AR|[Mm]²|[Mm]2)?[ \t\n\r\xa0]*$')
+UNIT_MULTIPLIERS = {'juta': 10 ** 6, 'jt': 10 ** 6, 'miliar': 10 ** 9, 'milyar': 10 ** 9}
+
+
+def split_lokasi(lokasi):
+    """This function splits the "lokasi" column into a "kecamatan" and a "kota" column, empty when they are missing.
+
+    It gives the same values as re.findall(r'([^,]+),', x)[0] and re.findall(r',\\s*([^,]+)', x)[0],
+    but the regular expression runs once per row inside pandas instead of four times in Python. With
+    pyarrow installed, the regular values are split in C and only the others go through pandas.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        return lokasi.str.extract(LOKASI_PATTERN).fillna('')
+
+    parts = pc.extract_regex(pa.array(lokasi, type=pa.string(), from_pandas=True), LOKASI_FAST_PATTERN)
+    result = pd.DataFrame({'kecamatan': parts.field('kecamatan').to_numpy(zero_copy_only=False),
+                           'kota': parts.field('kota').to_numpy(zero_copy_only=False)}, index=lokasi.index)
+    irregular = parts.is_null().to_numpy(zero_copy_only=False)
+    if irregular.any():
+        result.loc[irregular] = lokasi[irregular].str.extract(LOKASI_PATTERN).fillna('').to_numpy()
+    return result
+
+
+def parse_numbers(values):
+    """This function parses a column of numbers written as text into an int64 array and a validity mask.
+
+    Missing values, values without a number such as "Kontak agen untuk harga" and numbers that are not
+    above 0 are not valid, and their value is 0. "Juta" and "Miliar" multiply the number by a million and
+    a billion, and the decimals are rounded. With pyarrow installed, the values are parsed in C.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        parts = values.str.extract(NUMBER_PATTERN).fillna('')
+        matched = (parts['integer'] != '').to_numpy()
+        text = parts['integer'].str.replace('.', '', regex=False) + '.' + parts['comma'] + parts['dot']
+        number = pd.to_numeric(text.where(matched)).to_numpy(dtype=float)
+        unit = parts['unit'].str.lower()
+    else:
+        # flatten() gives the rows that do not match a missing value in every group
+        integer, comma, dot, unit = pc.extract_regex(pa.array(values, type=pa.string(), from_pandas=True),
+                                                     NUMBER_PATTERN).flatten()
+        matched = integer.is_valid().to_numpy(zero_copy_only=False)
+        text = pc.binary_join_element_wise(pc.replace_substring(integer, '.', ''),
+                                           pc.binary_join_element_wise(comma, dot, ''), '.')
+        number = pc.cast(text, pa.float64()).to_numpy(zero_copy_only=False)
+        unit = pd.Series(pc.utf8_lower(unit).to_numpy(zero_copy_only=False))
+
+    number = np.rint(number * unit.map(UNIT_MULTIPLIERS).fillna(1).to_numpy())
+    with np.errstate(invalid='ignore'):
+        valid = matched & (number > 0) & (number < 2 ** 63)
+    return np.where(valid, number, 0).astype(np.int64), valid
+
+
+def row_digests(df):
+    """This function returns a 64-bit hash of every row, which identifies duplicates without keeping the rows."""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def drop_seen_rows(df, seen):
+    """This function removes the rows that are in `seen` or earlier in the frame, and adds the others to `seen`."""
+    digests = row_digests(df)
+    new = ~pd.Series(digests).duplicated().to_numpy()
+    new &= np.fromiter((digest not in seen for digest in digests.tolist()), dtype=bool, count=len(digests))
+    seen.update(digests[new].tolist())
+    return df[new]
+
+
+def clean_listings(df, seen=None, patches=ROW_PATCHES, keep_digests=False):
+    """This function cleans the listing data, or one chunk of it, and returns the cleaned listing data.
+
+    The listing data has to be read as strings (dtype=str), so a value is the same in every chunk.
+    Without `seen`, duplicates are removed within the frame. With a set of row digests, duplicates of
+    earlier chunks are removed too, and the digests of the new rows are added to it. With `keep_digests`,
+    the digest of the raw row is kept in a "digest" column, to remove duplicates between files later.
+    The rooms, the areas and the price are parsed by parse_numbers, and the rows with a missing value,
+    an invalid number or a number above NUMBER_LIMITS are filtered with one mask and copied once, instead
+    of once per step. The numbers above their limit are counted and printed.
+    """
+    # Tidying up the column names in the dataframe
+    df.columns = [col.strip() for col in df.columns]
+    extra_columns = []
+    if keep_digests:
+        df = df.assign(digest=row_digests(df))
+        extra_columns = ['digest']
+
+    # Remove duplicate data
+    df = df.drop_duplicates() if seen is None else drop_seen_rows(df, seen)
+
+    # Parse the rooms, the areas ("90 m²") and the price ("Rp 1.500.000", "Rp 1,5 Miliar"), and remove the rows
+    # with missing values, a value of 0, a value that does not fit its type, or without a price
+    # ("Kontak agen untuk harga") in one pass
+    keep = df.notna().all(axis=1).to_numpy()
+    numbers = {}
+    for column in NUMERIC_COLUMNS + ['harga']:
+        numbers[column], valid = parse_numbers(df[column])
+        out_of_range = valid & (numbers[column] > NUMBER_LIMITS[column])
+        if out_of_range.any():
+            print(f"Out of range: {out_of_range.sum()} rows with a {column} above {NUMBER_LIMITS[column]} are removed")
+        keep &= valid & ~out_of_range
+    df = df.loc[keep, ['lokasi'] + extra_columns].copy()
+    for column, values in numbers.items():
+        df[column] = values[keep]
+
+    # Creating two new columns for "kecamatan" and "kota", and correcting the rows that are known to be wrong
+    df[['kecamatan', 'kota']] = split_lokasi(df['lokasi'])
+    for row, values in patches.items():
+        if row in df.index:
+            df.loc[row, list(values)] = list(values.values())
+
+    # Find the province of every city, and eliminate rows with an empty "kecamatan" or "kota"
+    df['provinsi'] = resolve_provinces(df['kota'])
+    return df.loc[(df['kota'] != "") & (df['kecamatan'] != ""), CLEAN_COLUMNS + extra_columns]
@@ -0,0 +1,133 @@
+# Initialize library
+import difflib
+import re
+from functools import lru_cache
+import pandas as pd
+
+# Cities and regencies of every province, with their Indonesian names. Other spellings of the listings
+# (case, "Kab." suffixes, English names, typos) are resolved by normalize_city, CITY_ALIASES and fuzzy matching
+PROVINCE_CITIES = {
+    'Aceh': ['Banda Aceh', 'Aceh Besar', 'Aceh Singkil', 'Langsa', 'Aceh Tengah', 'Aceh Barat', 'Aceh Barat Daya',
+             'Nagan Raya'],
+    'Bali': ['Denpasar', 'Tabanan', 'Badung', 'Gianyar', 'Buleleng', 'Karangasem', 'Klungkung', 'Jembrana', 'Bangli'],
+    'Kepulauan Bangka Belitung': ['Pangkal Pinang', 'Bangka'],
+    'Banten': ['Tangerang', 'Cilegon', 'Tangerang Selatan', 'Pandeglang', 'Serang', 'Lebak'],
+    'Bengkulu': ['Bengkulu Utara', 'Bengkulu', 'Bengkulu Selatan', 'Rejang Lebong', 'Bengkulu Tengah', 'Kaur',
+                 'Muko-Muko'],
+    'Jawa Tengah': ['Batang', 'Sragen', 'Wonogiri', 'Brebes', 'Pekalongan', 'Semarang', 'Solo', 'Boyolali', 'Salatiga',
+                    'Banyumas', 'Klaten', 'Sukoharjo', 'Tegal', 'Karanganyar', 'Magelang', 'Purworejo'],
+    'Kalimantan Tengah': ['Palangka Raya', 'Kotawaringin Barat'],
+    'Sulawesi Tengah': ['Palu', 'Toli-Toli', 'Sigi'],
+    'Jawa Timur': ['Banyuwangi', 'Ponorogo', 'Nganjuk', 'Surabaya', 'Malang', 'Batu', 'Kediri', 'Jember', 'Sidoarjo',
+                   'Mojokerto', 'Gresik', 'Pasuruan', 'Lamongan', 'Madiun', 'Jombang'],
+    'Kalimantan Timur': ['Penajam Paser Utara', 'Balikpapan', 'Samarinda', 'Bontang', 'Paser'],
+    'Kalimantan Utara': ['Tarakan'],
+    'Nusa Tenggara Timur': ['Manggarai Barat', 'Kupang', 'Sikka'],
+    'Gorontalo': ['Gorontalo'],
+    'DKI Jakarta': ['Kepulauan Seribu', 'Jakarta Selatan', 'Jakarta Barat', 'Jakarta Timur', 'Jakarta Pusat',
+                    'Jakarta Utara'],
+    'Jambi': ['Jambi', 'Muaro Jambi', 'Bungo'],
+    'Lampung': ['Lampung Utara', 'Bandar Lampung', 'Lampung Selatan', 'Metro', 'Pesawaran', 'Pringsewu',
+                'Lampung Tengah', 'Tulang Bawang', 'Way Kanan'],
+    'Maluku Utara': ['Ternate'],
+    'Sulawesi Utara': ['Tomohon', 'Manado', 'Minahasa Utara', 'Minahasa', 'Minahasa Selatan'],
+    'Sumatera Utara': ['Medan', 'Deli Serdang', 'Binjai', 'Pematang Siantar', 'Tebing Tinggi', 'Langkat',
+                       'Serdang Bedagai', 'Karo', 'Asahan', 'Toba Samosir', 'Padang Sidempuan', 'Simalungun'],
+    'Papua': ['Jayapura', 'Paniai', 'Mimika'],
+    'Riau': ['Pekanbaru', 'Kampar', 'Dumai', 'Bengkalis', 'Siak'],
+    'Kepulauan Riau': ['Batam', 'Tanjung Pinang', 'Bintan', 'Karimun', 'Natuna', 'Kepulauan Anambas'],
+    'Sulawesi Tenggara': ['Kendari'],
+    'Kalimantan Selatan': ['Banjarmasin', 'Banjarbaru', 'Banjar', 'Tabalong', 'Tanah Laut', 'Barito Kuala',
+                           'Hulu Sungai Selatan'],
+    'Sulawesi Selatan': ['Makassar', 'Pare-Pare', 'Maros', 'Gowa', 'Takalar', 'Pinrang'],
+    'Sumatera Selatan': ['Prabumulih', 'Ogan Komering Ulu Timur', 'Palembang', 'Banyuasin', 'Ogan Ilir',
+                         'Muara Enim', 'Lubuk Linggau', 'Musi Banyuasin', 'Pagar Alam'],
+    'Jawa Barat': ['Subang', 'Majalengka', 'Ciamis', 'Garut', 'Tasikmalaya', 'Kuningan', 'Bandung', 'Bogor', 'Bekasi',
+                   'Cirebon', 'Karawang', 'Depok', 'Purwakarta', 'Cianjur', 'Cimahi', 'Bandung Barat', 'Sumedang',
+                   'Sukabumi'],
+    'Kalimantan Barat': ['Singkawang', 'Sintang', 'Pontianak', 'Ketapang', 'Kubu Raya', 'Kayong Utara'],
+    'Nusa Tenggara Barat': ['Mataram', 'Lombok Barat', 'Lombok Tengah', 'Lombok Utara'],
+    'Papua Barat': ['Sorong'],
+    'Sumatera Barat': ['Padang', 'Bukittinggi', 'Padang Pariaman', 'Payakumbuh', 'Solok', 'Dharmasraya',
+                       'Pasaman Barat'],
+    'DI Yogyakarta': ['Yogyakarta', 'Kulon Progo', 'Sleman', 'Gunung Kidul', 'Bantul'],
+}
+
+# Known misspellings of the listings, by normalized name
+CITY_ALIASES = {
+    'singkawan': 'Singkawang',
+    'prambulih': 'Prabumulih',
+    'panajam paser utara': 'Penajam Paser Utara',
+}
+
+# English names are written "West Bandung" instead of "Bandung Barat"
+ENGLISH_DIRECTIONS = {'west': 'barat', 'east': 'timur', 'north': 'utara', 'south': 'selatan', 'central': 'tengah'}
+ADMINISTRATIVE_WORDS = re.compile(r'^(?:kabupaten|kab|kota|regency of|city of) | (?:kabupaten|kab|kota|regency|city)$')
+
+# Fuzzy matches only correct typos: the name has at least fuzzy_min_length characters, is at least this similar to
+# a known city and differs from it by one character. Other real regencies that are missing from the table, such as
+# "Bantaeng" (not "Batang") or "Serdang" (not "Serang"), stay without a province instead of taking a wrong one
+fuzzy_cutoff = 0.9
+fuzzy_min_length = 8
+
+
+def normalize_city(name):
+    """This function turns a city name into the key of the index: lower case, single spaces, no "Kab." and Indonesian."""
+    key = ' '.join(re.sub(r'[.\-]', ' ', str(name)).casefold().split())
+    key = ADMINISTRATIVE_WORDS.sub('', key).strip()
+    words = key.split(' ')
+    if len(words) > 1 and words[0] in ENGLISH_DIRECTIONS:
+        words = words[1:] + [ENGLISH_DIRECTIONS[words[0]]]
+    return ' '.join(words)
+
+
+def build_city_index(province_cities=PROVINCE_CITIES, aliases=CITY_ALIASES):
+    """This function inverts the province table into {normalized city: (city, province)}."""
+    index = {}
+    for province, cities in province_cities.items():
+        for city in cities:
+            index.setdefault(normalize_city(city), (city, province))
+    for alias, city in aliases.items():
+        index.setdefault(alias, index[normalize_city(city)])
+    return index
+
+
+CITY_INDEX = build_city_index()
+
+
+def edit_count(a, b):
+    """This function returns the number of characters that are inserted, deleted or replaced between two names."""
+    return sum(max(i2 - i1, j2 - j1) for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b).get_opcodes()
+               if tag != 'equal')
+
+
+@lru_cache(maxsize=None)
+def resolve_city(name):
+    """This function returns the (city, province) of a city name, or (None, None) when it is unknown.
+
+    Names that are not in the index after normalisation are matched to the most similar known name
+    when they only differ by a typo, and every fuzzy match is printed, so it can be added to
+    CITY_ALIASES. The answer is memoised, so every distinct name is only looked up once.
+    """
+    key = normalize_city(name)
+    if key in CITY_INDEX:
+        return CITY_INDEX[key]
+    if len(key) < fuzzy_min_length:
+        return None, None
+    matches = difflib.get_close_matches(key, CITY_INDEX, n=1, cutoff=fuzzy_cutoff)
+    if not matches or edit_count(key, matches[0]) > 1:
+        return None, None
+    city, province = CITY_INDEX[matches[0]]
+    print(f"Fuzzy match: {name!r} is resolved to {city} ({province}), add it to CITY_ALIASES if it is right")
+    return city, province
+
+
+def resolve_provinces(kota):
+    """This function returns the province of every value of a "kota" column.
+
+    Only the distinct cities are resolved, the provinces are then joined back to the rows by their codes.
+    """
+    codes, cities = pd.factorize(kota)
+    provinces = pd.Series([resolve_city(city)[1] for city in cities] + [None], dtype=object)
+    # Missing cities have the code -1, which takes the None at the end
+    return pd.Series(provinces.to_numpy()[codes], index=kota.index, name='provinsi')
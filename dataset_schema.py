@@ -0,0 +1,121 @@
+# Initialize library
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Types of the columns of the cleaned datasets. The locations repeat a few hundred names over all rows,
+# so they are stored as categoricals, and the numbers get the smallest type that fits their range. "provinsi_id"
+# is the code of the province in province_dimension.PROVINCES, which the datasets are joined on
+LISTING_SCHEMA = {
+    'kecamatan': 'category',
+    'kota': 'category',
+    'provinsi_id': 'int8',
+    'provinsi': 'category',
+    'kamar_tidur': 'int16',
+    'kamar_mandi': 'int16',
+    'luas_tanah': 'int32',
+    'luas_bangunan': 'int32',
+    'harga': 'int64',
+}
+
+UMP_SCHEMA = {
+    'provinsi_id': 'int8',
+    'provinsi': 'category',
+    'ump': 'float64',
+    'rata_rata_angsuran': 'int32',
+}
+
+
+def apply_schema(df, schema=LISTING_SCHEMA):
+    """This function casts the columns of a DataFrame to the schema, and fails when a number does not fit its type.
+
+    The cleaning removes the numbers that do not fit (listing_transforms.NUMBER_LIMITS), so the error only
+    checks that the data was cleaned, instead of letting astype wrap the values around.
+    """
+    for column, dtype in schema.items():
+        if column not in df.columns or dtype == 'category' or np.dtype(dtype).kind not in 'iu':
+            continue
+        info = np.iinfo(dtype)
+        if len(df) and (df[column].min() < info.min or df[column].max() > info.max):
+            raise ValueError(f"The values of {column!r} do not fit in {dtype}: "
+                             f"{df[column].min()} to {df[column].max()}")
+    return df.astype({column: dtype for column, dtype in schema.items()
+                      if column in df.columns and str(df[column].dtype) != dtype})
+
+
+def columnar_path(path):
+    """This function returns the path of the Feather file that is written next to a CSV file."""
+    return Path(path).with_suffix('.feather')
+
+
+def write_dataset(df, path, schema=None):
+    """This function writes a cleaned dataset as CSV and as an uncompressed Feather (Arrow IPC) file next to it.
+
+    The Feather file keeps the types of the schema, including the categories, and since it is not
+    compressed it can be memory-mapped by the readers instead of parsed.
+    """
+    if schema is not None:
+        df = apply_schema(df, schema)
+    df.to_csv(path, index=False)
+    feather.write_feather(df.reset_index(drop=True), columnar_path(path), compression='uncompressed')
+    return df
+
+
+def read_dataset(path, schema=None, columns=None, memory_map=True):
+    """This function reads a cleaned dataset with the types of its schema, optionally only some of its columns.
+
+    When the Feather file next to the CSV file is at least as recent, it is memory-mapped and only the
+    requested columns are read, otherwise the CSV file is parsed.
+    """
+    path = Path(path)
+    columnar = columnar_path(path)
+    if columnar.exists() and (not path.exists() or columnar.stat().st_mtime >= path.stat().st_mtime):
+        df = feather.read_table(columnar, columns=columns, memory_map=memory_map).to_pandas()
+    else:
+        dtype = None if schema is None else {column: dtype for column, dtype in schema.items()
+                                             if columns is None or column in columns}
+        df = pd.read_csv(path, usecols=columns, dtype=dtype)
+    return df if schema is None else apply_schema(df, schema)
+
+
+class DatasetAppender:
+    """This class writes a cleaned dataset chunk by chunk, as CSV and as an uncompressed Feather file.
+
+    The categories of the chunks differ, so the categorical columns are stored as strings in the
+    Feather file, read_dataset turns them into categories again with the schema.
+    """
+
+    def __init__(self, path, schema):
+        self.path = Path(path)
+        self.schema = schema
+        self.arrow_schema = pa.schema([(column, pa.string() if dtype == 'category' else pa.from_numpy_dtype(np.dtype(dtype)))
+                                       for column, dtype in schema.items()])
+        self.writer = pa.ipc.new_file(columnar_path(path), self.arrow_schema)
+        self.header = True
+
+    def write(self, df):
+        df = apply_schema(df, self.schema)
+        df.to_csv(self.path, index=False, mode='w' if self.header else 'a', header=self.header)
+        self.header = False
+        columns = [column for column in self.schema if column in df.columns]
+        table = pa.Table.from_pandas(df[columns].astype({column: object for column in columns
+                                                         if self.schema[column] == 'category'}),
+                                     schema=self.arrow_schema, preserve_index=False)
+        self.writer.write_table(table)
+        return df
+
+    def close(self):
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def memory_mb(df):
+    """This function returns the memory used by a DataFrame in MB, including the strings."""
+    return df.memory_usage(deep=True).sum() / 2 ** 20
@@ -1,3 +1,4 @@
+import sys
 import pandas as pd
 from pathlib import Path
 from sklearn.cluster import KMeans
@@ -5,10 +6,13 @@ from sklearn.cluster import KMeans
 # --- PATH SETTINGS ---
 current_dir = Path(__file__).parent if "__file__" in locals() else Path.cwd()
 previous_dir = current_dir.parent
+sys.path.append(str(previous_dir))
+from dataset_schema import UMP_SCHEMA, read_dataset, write_dataset
+from province_dimension import add_province_codes
 
 # --- CREATE A DATAFRAME ---
 cleaned_income_province_path = previous_dir / "datasets" / "cleaned_ump_data.csv"
-df_income = pd.read_csv(cleaned_income_province_path)
+df_income = read_dataset(cleaned_income_province_path, UMP_SCHEMA)
 
 # Assuming df_income is your original DataFrame
 df_cluster = df_income.copy()
@@ -65,9 +69,12 @@ if len(X) >= samples_num:
     # Display the combined DataFrame
     print("\nCombined DataFrame:")
     print(combined_df)
+
+    # Saving with the code of every province, which app.py joins the clusters on
+    combined_df = add_province_codes(combined_df)
     output_dir = previous_dir / "datasets"
     cluster_path = output_dir / "cluster.csv"
-    combined_df.to_csv(cluster_path, index=False)
+    write_dataset(combined_df, cluster_path)
 
 else:
     print("Insufficient data points for clustering.")
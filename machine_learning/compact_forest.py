@@ -0,0 +1,157 @@
+# Initialize library
+import json
+import pickle
+from pathlib import Path
+import numpy as np
+
+# Files of a compact model. Every array is a plain .npy file, so it is memory-mapped when the model is loaded
+# and only the pages of the nodes that a prediction visits are read from the disk
+ARRAY_NAMES = ['roots', 'right', 'feature', 'value']
+meta_filename = 'meta.json'
+preprocessor_filename = 'preprocessor.pkl'
+
+# Rows that are predicted at the same time, which bounds the memory of the dense features and of the paths
+batch_size = 4096
+
+
+def flatten_tree(tree, max_depth=None):
+    """This function returns the nodes of a fitted sklearn tree as three arrays: right, feature and value.
+
+    The nodes stay in the order sklearn builds them, where the left child of a node is the next node,
+    so only the right child is stored. The feature of a leaf is -1, and "value" holds the threshold of a
+    split and the prediction of a leaf. With `max_depth`, the nodes below it are dropped, and the nodes
+    at that depth become leaves that predict the mean of their samples.
+    """
+    left = tree.children_left
+    split = left >= 0
+    if not (left[split] == np.flatnonzero(split) + 1).all():
+        raise ValueError("The trees have to be built depth first, without max_leaf_nodes")
+
+    keep = np.ones(tree.node_count, dtype=bool)
+    if max_depth is not None:
+        # Walk down the tree level by level, the nodes below max_depth are never reached
+        keep[:] = False
+        level = np.array([0])
+        for depth in range(max_depth + 1):
+            keep[level] = True
+            if depth == max_depth:
+                split[level] = False
+            children = np.concatenate([left[level], tree.children_right[level]])
+            level = children[children >= 0]
+
+    # The kept nodes are still in depth-first order, so the left child of a split is still the next node
+    new_index = np.cumsum(keep) - 1
+    split = split[keep]
+    right = np.where(split, new_index[np.maximum(tree.children_right[keep], 0)], 0)
+    feature = np.where(split, tree.feature[keep], -1)
+    value = np.where(split, tree.threshold[keep], tree.value[keep, 0, 0])
+    return right, feature, value
+
+
+class CompactForest:
+    """This class predicts with the trees of a random forest stored as flat arrays, one node after the other.
+
+    A fitted sklearn tree keeps 72 bytes per node, with the impurity and the number of samples that a
+    prediction does not need. Here a node is 14 bytes at most: the index of its right child, its feature
+    and its threshold or its prediction.
+    """
+
+    def __init__(self, roots, right, feature, value, n_features):
+        self.roots = roots
+        self.right = right
+        self.feature = feature
+        self.value = value
+        self.n_features = n_features
+
+    @classmethod
+    def from_forest(cls, forest, max_trees=None, max_depth=None):
+        """This function flattens the first `max_trees` trees of a fitted forest, cut at `max_depth`."""
+        trees = [flatten_tree(estimator.tree_, max_depth) for estimator in forest.estimators_[:max_trees]]
+        sizes = [len(right) for right, _, _ in trees]
+        if sum(sizes) >= 2 ** 31:
+            raise ValueError("The forest has too many nodes, cap its trees or its depth")
+        roots = np.cumsum([0] + sizes[:-1])
+        feature_dtype = np.int16 if forest.n_features_in_ < 2 ** 15 else np.int32
+        # The right children are numbered within their tree, and become indexes in the whole forest here
+        right = np.concatenate([tree_right + root for (tree_right, _, _), root in zip(trees, roots)])
+        return cls(roots.astype(np.int64), right.astype(np.int32),
+                   np.concatenate([feature for _, feature, _ in trees]).astype(feature_dtype),
+                   np.concatenate([value for _, _, value in trees]).astype(np.float64), forest.n_features_in_)
+
+    def save(self, path):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(path / f"{name}.npy", getattr(self, name))
+        meta = {'n_features': int(self.n_features), 'n_trees': len(self.roots), 'n_nodes': len(self.value)}
+        (path / meta_filename).write_text(json.dumps(meta, indent=1), encoding='utf-8')
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """This function loads the arrays of a saved forest, memory-mapped unless `mmap_mode` is None."""
+        path = Path(path)
+        meta = json.loads((path / meta_filename).read_text(encoding='utf-8'))
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode=mmap_mode) for name in ARRAY_NAMES}
+        return cls(**arrays, n_features=meta['n_features'])
+
+    def predict(self, X):
+        """This function returns the mean prediction of the trees for the rows of X, dense or sparse.
+
+        Like sklearn, the features are compared as float32 with the thresholds. All the trees go down
+        one level at a time for all the rows of a batch, so the loop runs once per level in numpy
+        instead of once per node in Python.
+        """
+        predictions = np.empty(X.shape[0])
+        for start in range(0, X.shape[0], batch_size):
+            batch = X[start:start + batch_size]
+            batch = batch.toarray() if hasattr(batch, 'toarray') else np.asarray(batch)
+            predictions[start:start + batch_size] = self._predict_batch(batch.astype(np.float32))
+        return predictions
+
+    def _predict_batch(self, X):
+        rows = np.tile(np.arange(X.shape[0]), len(self.roots))
+        nodes = np.repeat(np.asarray(self.roots), X.shape[0])
+        # The paths that have not reached a leaf yet
+        active = np.arange(len(nodes))
+        while active.size:
+            node = nodes[active]
+            feature = self.feature[node]
+            split = feature >= 0
+            active, node, feature = active[split], node[split], feature[split]
+            go_left = X[rows[active], feature] <= self.value[node]
+            nodes[active] = np.where(go_left, node + 1, self.right[node])
+        return self.value[nodes].reshape(len(self.roots), X.shape[0]).mean(axis=0)
+
+
+class CompactModel:
+    """This class is the compact version of the pipeline of machine_learning.py: its preprocessor and its forest."""
+
+    def __init__(self, preprocessor, forest):
+        self.preprocessor = preprocessor
+        self.forest = forest
+
+    def predict(self, X):
+        return self.forest.predict(self.preprocessor.transform(X))
+
+
+def export_model(pipeline, path, max_trees=None, max_depth=None, step='regressor'):
+    """This function saves a fitted pipeline as a compact model: the pickled preprocessor and the flat forest."""
+    path = Path(path)
+    forest = CompactForest.from_forest(pipeline.named_steps[step], max_trees, max_depth)
+    forest.save(path)
+    with open(path / preprocessor_filename, 'wb') as file:
+        pickle.dump(pipeline[:-1], file)
+    return CompactModel(pipeline[:-1], forest)
+
+
+def load_model(path, mmap_mode='r'):
+    """This function loads a compact model saved by export_model, with its arrays memory-mapped."""
+    path = Path(path)
+    with open(path / preprocessor_filename, 'rb') as file:
+        preprocessor = pickle.load(file)
+    return CompactModel(preprocessor, CompactForest.load(path, mmap_mode))
+
+
+def directory_size(path):
+    """This function returns the size of the files of a directory in bytes."""
+    return sum(file.stat().st_size for file in Path(path).iterdir() if file.is_file())
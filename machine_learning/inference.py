@@ -0,0 +1,102 @@
+# Initialize library
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from compact_forest import CompactForest
+
+# File of the feature schema, saved in the directory of the compact model
+feature_schema_filename = 'feature_schema.json'
+
+
+class FeatureSchema:
+    """This class builds the features of the price model from listings, without the training data.
+
+    It keeps what the preprocessor of machine_learning.py learnt on the training data: the mean and the
+    scale of every numeric column, the categories of every categorical column and the position of every
+    column in the features. A listing is scaled and encoded with them directly, so one prediction costs
+    the same whatever the number of houses the model was trained on. It also keeps the cities of every
+    province of the training data, which the app offers in its select boxes.
+    """
+
+    def __init__(self, numeric, categorical, n_features, cities):
+        self.numeric = numeric
+        self.categorical = categorical
+        self.n_features = n_features
+        self.cities = cities
+        self.numeric_columns = [column['name'] for column in numeric]
+        self.mean = np.array([column['mean'] for column in numeric])
+        self.scale = np.array([column['scale'] for column in numeric])
+        self.start = {column['name']: column['start'] for column in numeric + categorical}
+        self.category_index = {column['name']: pd.Index(column['categories']) for column in categorical}
+
+    @classmethod
+    def from_pipeline(cls, pipeline, X_train, step='preprocessor'):
+        """This function reads the schema from the fitted ColumnTransformer of a pipeline and its training data."""
+        preprocessor = pipeline.named_steps[step]
+        scaler = preprocessor.named_transformers_['scaler']
+        encoder = preprocessor.named_transformers_['one_hot']
+        if encoder.drop is not None or getattr(encoder, 'infrequent_categories_', None) is not None:
+            raise ValueError("The schema only supports a one-hot encoding of every category")
+
+        start = preprocessor.output_indices_['scaler'].start
+        numeric = [{'name': name, 'mean': float(mean), 'scale': float(scale), 'start': start + position}
+                   for position, (name, mean, scale) in enumerate(zip(scaler.feature_names_in_, scaler.mean_,
+                                                                      scaler.scale_))]
+        categorical = []
+        start = preprocessor.output_indices_['one_hot'].start
+        for name, categories in zip(encoder.feature_names_in_, encoder.categories_):
+            categorical.append({'name': name, 'categories': categories.tolist(), 'start': start})
+            start += len(categories)
+
+        provinces = X_train.groupby('provinsi', observed=True)['kota']
+        cities = {province: sorted(kota.unique().tolist()) for province, kota in provinces}
+        n_features = max(indices.stop for indices in preprocessor.output_indices_.values())
+        return cls(numeric, categorical, n_features, dict(sorted(cities.items())))
+
+    def save(self, path):
+        schema = {'numeric': self.numeric, 'categorical': self.categorical, 'n_features': self.n_features,
+                  'cities': self.cities}
+        (Path(path) / feature_schema_filename).write_text(json.dumps(schema, indent=1), encoding='utf-8')
+
+    @classmethod
+    def load(cls, path):
+        return cls(**json.loads((Path(path) / feature_schema_filename).read_text(encoding='utf-8')))
+
+    def transform(self, listings):
+        """This function returns the float32 features of one listing (a dict of values) or a batch of listings.
+
+        A batch is a DataFrame or a dict of columns. The numbers are scaled like the StandardScaler, and
+        every category sets one column to 1 like the OneHotEncoder, or none when the model did not see it.
+        """
+        if isinstance(listings, dict):
+            listings = {name: np.atleast_1d(values) for name, values in listings.items()}
+        n_rows = len(listings[self.numeric_columns[0]])
+        features = np.zeros((n_rows, self.n_features), dtype=np.float64)
+
+        numbers = np.column_stack([np.asarray(listings[name], dtype=np.float64) for name in self.numeric_columns])
+        columns = [self.start[name] for name in self.numeric_columns]
+        features[:, columns] = (numbers - self.mean) / self.scale
+
+        for name, index in self.category_index.items():
+            positions = index.get_indexer(np.asarray(listings[name], dtype=object))
+            known = positions >= 0
+            features[np.flatnonzero(known), self.start[name] + positions[known]] = 1
+        # The forest compares the features as float32, the scaling is done in float64 before like sklearn
+        return features.astype(np.float32)
+
+
+class PricePredictor:
+    """This class predicts the prices of listings with the feature schema and the compact forest."""
+
+    def __init__(self, schema, forest):
+        self.schema = schema
+        self.forest = forest
+
+    def predict(self, listings):
+        return self.forest.predict(self.schema.transform(listings))
+
+
+def load_predictor(path, mmap_mode='r'):
+    """This function loads the predictor from the directory of a compact model, with its trees memory-mapped."""
+    return PricePredictor(FeatureSchema.load(path), CompactForest.load(path, mmap_mode))
@@ -1,13 +1,18 @@
 # Initialize library
+import sys
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, mean_absolute_error, mean_absolute_percentage_error, r2_score
 from sklearn.ensemble import RandomForestRegressor
 import pickle
 import time
 from pathlib import Path
+from compact_forest import directory_size, export_model, load_model
+from inference import FeatureSchema, load_predictor
 
 
 # --- CONFIG ---
@@ -15,13 +20,36 @@ pd.set_option('display.max_columns', None)
 pd.set_option('display.max_rows', None)
 pd.set_option('display.float_format', lambda x: '%.02f' % x)
 
+# The one-hot encoded features are sparse, their memory grows with the number of houses and not with the number
+# of houses times the number of cities. The sparse splitter of the random forest is about twice as slow to fit
+# on the listing data, False gives the dense features to the forest instead
+sparse_features = True
+
+# Tuning mode (python machine_learning.py --tune): the hyperparameters of the random forest are searched with
+# successive halving on all cores before the model is trained, see tuning.py. The folds that were fitted before
+# are read from the cache, and the leaderboard of the configurations is saved next to the model
+tuning = '--tune' in sys.argv[1:]
+leaderboard_filename = 'tuning_leaderboard.csv'
+
+# Compact export of the model for the app, see compact_forest.py: the trees as memory-mapped arrays instead of a
+# pickle. The number of trees and the depth can be capped to make it smaller and faster, None keeps the whole
+# forest. The size, the load time, the latency and the accuracy of both models are printed to compare them
+compact_model_dirname = 'rf_regressor_model_compact'
+compact_max_trees = None
+compact_max_depth = None
+
 # --- PATH SETTINGS ---
 current_dir = Path(__file__).parent if "__file__" in locals() else Path.cwd()
 previous_dir = current_dir.parent
+tuning_cache_dir = current_dir / "tuning_cache"
+sys.path.append(str(previous_dir))
+from dataset_schema import LISTING_SCHEMA, read_dataset
 
 # --- CREATE A DATAFRAME ---
 cleaned_listing_data = previous_dir / "datasets" / "cleaned_listing_data.csv"
-df_house = pd.read_csv(cleaned_listing_data)
+# Only the columns of the model are read, "kecamatan" is not one of them
+model_columns = ['kota', 'provinsi', 'kamar_tidur', 'kamar_mandi', 'luas_tanah', 'luas_bangunan', 'harga']
+df_house = read_dataset(cleaned_listing_data, LISTING_SCHEMA, columns=model_columns)
 
 # --- MACHINE LEARNING
 df_house_baru = df_house.copy()
@@ -29,32 +57,47 @@ df_house_baru = df_house.copy()
 # Removing houses that have a price under 50 million
 df_house_baru = df_house_baru[df_house_baru['harga'] >= 50000000]
 
-# Drop columns
-df_house_baru = df_house_baru.drop(['kecamatan'], axis=1)
-
-# Performing one-hot encoding
-df_house_baru = pd.get_dummies(df_house_baru, columns=['provinsi', 'kota'])
-
-# Performing scaler
-scaler = StandardScaler()
-df_house_baru[['kamar_tidur', 'kamar_mandi', 'luas_tanah', 'luas_bangunan']] = scaler.fit_transform(df_house_baru[['kamar_tidur', 'kamar_mandi', 'luas_tanah', 'luas_bangunan']])
-
 # Separating Features and Labels
-df_machine_learning = df_house_baru.copy()
-X = df_machine_learning.drop('harga', axis=1)
-y = df_machine_learning['harga']
+numeric_features = ['kamar_tidur', 'kamar_mandi', 'luas_tanah', 'luas_bangunan']
+categorical_features = ['provinsi', 'kota']
+X = df_house_baru[numeric_features + categorical_features]
+y = df_house_baru['harga']
 
 # Record the start time
 start_time = time.time()
 
-# Create the model
-rf_regressor_model = RandomForestRegressor(random_state=28)
+# Create the model: the scaler, the one-hot encoding of the provinces and cities, and the random forest in one
+# pipeline. The encoding is sparse, so the features take memory for their non-zero values only instead of one
+# column per city for every house, and the scaler and the categories are fitted on the training data only
+preprocessor = ColumnTransformer([
+    ('scaler', StandardScaler(), numeric_features),
+    ('one_hot', OneHotEncoder(handle_unknown='ignore', dtype=np.float32), categorical_features),
+], sparse_threshold=1.0 if sparse_features else 0.0)
+rf_regressor_model = Pipeline([
+    ('preprocessor', preprocessor),
+    ('regressor', RandomForestRegressor(random_state=28, n_jobs=-1)),
+])
 
 # Preparing Training, Testing, And Validating Dataset
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
+# Searching the hyperparameters on the training data, the best configuration of the last rung is trained below
+if tuning:
+    from tuning import successive_halving
+    leaderboard, best_params = successive_halving(rf_regressor_model, X_train, y_train, tuning_cache_dir)
+    leaderboard.to_csv(leaderboard_filename, index=False)
+    print(leaderboard)
+    print(f"Leaderboard saved as {leaderboard_filename}")
+    rf_regressor_model.set_params(**{f'regressor__{name}': value for name, value in best_params.items()})
+    print(f"Best configuration: {best_params}")
+
 # Fit the model on training data
 rf_regressor_model.fit(X_train, y_train)
+features = rf_regressor_model.named_steps['preprocessor'].transform(X_train)
+if sparse_features:
+    print(f"Features: {features.shape[1]} columns, {features.nnz} non-zero values, "
+          f"{(features.data.nbytes + features.indices.nbytes + features.indptr.nbytes) / 2 ** 20:.1f} MB sparse "
+          f"instead of {features.shape[0] * features.shape[1] * 4 / 2 ** 20:.1f} MB dense")
 
 # Make predictions
 y_train_pred = rf_regressor_model.predict(X_train)
@@ -94,9 +137,54 @@ elapsed_time = end_time - start_time
 # Print the runtime
 print("Execution time: {:.2f} seconds".format(end_time - start_time))
 
-# Save the trained model using pickle
+# Save the trained model using pickle, the preprocessing steps are saved with it
 model_filename = 'rf_regressor_model.pkl'
 with open(model_filename, 'wb') as file:
     pickle.dump(rf_regressor_model, file)
 
 print(f"Model saved as {model_filename}")
+
+# --- COMPACT MODEL ---
+# The feature schema is saved with it, so the app builds the features of a listing without the preprocessor
+compact_model = export_model(rf_regressor_model, compact_model_dirname, compact_max_trees, compact_max_depth)
+FeatureSchema.from_pipeline(rf_regressor_model, X_train).save(compact_model_dirname)
+predictor = load_predictor(compact_model_dirname)
+print(f"Compact model and feature schema saved as {compact_model_dirname}")
+
+
+def best_time(function, repeat=1):
+    """This function returns the shortest duration of `repeat` calls of a function, in seconds."""
+    durations = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start_time)
+    return min(durations)
+
+
+def load_pickled_model():
+    with open(model_filename, 'rb') as file:
+        return pickle.load(file)
+
+
+# The predictor gets one listing as the app gives it, a dict of values
+compact_test_pred = compact_model.predict(X_test)
+predictor_test_pred = predictor.predict(X_test)
+one_listing = X_test.iloc[0].to_dict()
+comparison = pd.DataFrame({
+    'size_mb': [Path(model_filename).stat().st_size / 2 ** 20] + [directory_size(compact_model_dirname) / 2 ** 20] * 2,
+    'load_seconds': [best_time(load_pickled_model), best_time(lambda: load_model(compact_model_dirname)),
+                     best_time(lambda: load_predictor(compact_model_dirname))],
+    'one_row_ms': [best_time(lambda: rf_regressor_model.predict(X_test[:1]), 20) * 1000,
+                   best_time(lambda: compact_model.predict(X_test[:1]), 20) * 1000,
+                   best_time(lambda: predictor.predict(one_listing), 20) * 1000],
+    'test_set_seconds': [best_time(lambda: rf_regressor_model.predict(X_test)),
+                         best_time(lambda: compact_model.predict(X_test)),
+                         best_time(lambda: predictor.predict(X_test))],
+    'test_mape': [test_mape, mean_absolute_percentage_error(y_test, compact_test_pred),
+                  mean_absolute_percentage_error(y_test, predictor_test_pred)],
+    'test_r2': [test_r2, r2_score(y_test, compact_test_pred), r2_score(y_test, predictor_test_pred)],
+}, index=['pickle', 'compact', 'predictor'])
+print(comparison.to_string(float_format='{:.4f}'.format))
+print(f"Largest difference of the compact predictions: {np.abs(compact_test_pred - y_test_pred).max():.2f}, "
+      f"of the predictor: {np.abs(predictor_test_pred - y_test_pred).max():.2f}")
@@ -0,0 +1,85 @@
+# Initialize library
+import itertools
+import math
+import time
+import pandas as pd
+from joblib import Memory, Parallel, delayed, hash
+from sklearn.base import clone
+from sklearn.metrics import mean_absolute_percentage_error, r2_score
+from sklearn.model_selection import KFold
+
+# Hyperparameters of the random forest that are searched. The number of trees is the budget of the successive
+# halving: every configuration starts with min_trees, and only the best 1/factor of them get factor times more
+PARAM_GRID = {
+    'max_depth': [None, 40, 20, 10],
+    'max_features': [1.0, 0.5, 'sqrt'],
+}
+min_trees = 10
+max_trees = 100
+factor = 3
+num_folds = 3
+seed = 28
+
+
+def fit_fold(model, params, data_key, fold, X, y, train_index, test_index):
+    """This function fits the model with the parameters on one fold, and returns its times and its scores.
+
+    It is cached on disk by the model, the parameters, the hash of the data and the number of the fold, so
+    running the search again, or with a bigger budget, only fits the new folds. The data is hashed once
+    for the search instead of on every call, which took more than half a second per fold.
+    """
+    model = clone(model).set_params(**params)
+    start_time = time.perf_counter()
+    model.fit(X.iloc[train_index], y.iloc[train_index])
+    fit_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    y_pred = model.predict(X.iloc[test_index])
+    predict_seconds = time.perf_counter() - start_time
+    return {'fit_seconds': fit_seconds, 'predict_seconds': predict_seconds,
+            'mape': mean_absolute_percentage_error(y.iloc[test_index], y_pred),
+            'r2': r2_score(y.iloc[test_index], y_pred)}
+
+
+def successive_halving(model, X, y, cache_dir, step='regressor', param_grid=PARAM_GRID, n_jobs=-1):
+    """This function searches the hyperparameters of the random forest of the pipeline with successive halving.
+
+    Every rung fits the remaining configurations on every fold in parallel, one forest per process, and
+    keeps the best 1/factor of them by their mean MAPE on the held-out folds, with factor times more trees.
+    It returns the leaderboard with the fit time, the predict time, the MAPE and the R2 of every
+    configuration on every rung, the best configurations first, and the parameters of the best one.
+    """
+    cached_fit_fold = Memory(cache_dir, verbose=0).cache(fit_fold, ignore=['X', 'y', 'train_index', 'test_index'])
+    folds = list(KFold(n_splits=num_folds, shuffle=True, random_state=seed).split(X))
+    data_key = hash((X, y, num_folds, seed))
+    model = clone(model).set_params(**{f'{step}__n_jobs': 1})
+
+    candidates = [dict(zip(param_grid, values)) for values in itertools.product(*param_grid.values())]
+    trees = min_trees
+    rows = []
+    for rung in itertools.count():
+        tasks = [(candidate, fold) for candidate in candidates for fold in range(num_folds)]
+        results = Parallel(n_jobs=n_jobs)(
+            delayed(cached_fit_fold)(model, {**{f'{step}__{name}': value for name, value in candidate.items()},
+                                             f'{step}__n_estimators': trees}, data_key, fold, X, y, *folds[fold])
+            for candidate, fold in tasks)
+
+        scores = pd.DataFrame(results)
+        scores['candidate'] = [number for number in range(len(candidates)) for _ in folds]
+        scores = scores.groupby('candidate').mean()
+        for number, candidate in enumerate(candidates):
+            rows.append({'rung': rung, 'n_estimators': trees, **{name: str(value) for name, value in candidate.items()},
+                         **scores.loc[number].to_dict()})
+        print(f"Rung {rung}: {len(candidates)} configurations with {trees} trees, "
+              f"best MAPE {scores['mape'].min():.3f}")
+
+        if len(candidates) == 1 or trees >= max_trees:
+            break
+        best = scores['mape'].sort_values(kind='stable').index[:math.ceil(len(candidates) / factor)]
+        candidates = [candidates[number] for number in best]
+        trees = min(trees * factor, max_trees)
+
+    leaderboard = pd.DataFrame(rows)
+    leaderboard = leaderboard.sort_values(['rung', 'mape'], ascending=[False, True], kind='stable')
+    best_params = {**candidates[scores['mape'].idxmin()], 'n_estimators': trees}
+    return leaderboard.reset_index(drop=True), best_params
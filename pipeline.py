@@ -0,0 +1,227 @@
+# Initialize library
+import argparse
+import hashlib
+import json
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+# --- PATH SETTINGS ---
+current_dir = Path(__file__).parent if "__file__" in locals() else Path.cwd()
+state_path = current_dir / "pipeline_state.json"
+log_dir = current_dir / "pipeline_logs"
+
+# --- STAGES ---
+# Every stage is a script, run from its own directory, with the files it reads and the files it writes, relative
+# to the project. The inputs include the script and the modules it imports, so a change of the code runs the
+# stage again. Inputs can be glob patterns, and "any_inputs" are alternative sources, of which at least one file
+# has to exist. A stage that reads the output of another one runs after it, the others run in parallel.
+# app.py is not a stage: it is the dashboard (streamlit run app.py) that reads the datasets of the last run
+STAGES = {
+    'clean_listing': {
+        'script': "data_cleaning/cleaning_listing_data.py",
+        'inputs': ["data_cleaning/cleaning_listing_data.py", "data_cleaning/listing_transforms.py",
+                   "data_cleaning/listing_ingest.py", "data_cleaning/province_resolver.py", "dataset_schema.py",
+                   "province_dimension.py"],
+        # listing_data.csv or the scraper's files, depending on the source of cleaning_listing_data.py
+        'any_inputs': ["data_cleaning/listing_data.csv", "web_scraping/house_scraping_pagination_*.csv"],
+        'outputs': ["datasets/cleaned_listing_data.csv", "datasets/cleaned_listing_data.feather"],
+    },
+    'clean_population': {
+        'script': "data_cleaning/cleaning_population_data.py",
+        'inputs': ["data_cleaning/cleaning_population_data.py", "dataset_schema.py", "province_dimension.py",
+                   "data_cleaning/population_data.csv"],
+        'outputs': ["datasets/cleaned_population_data.csv", "datasets/cleaned_population_data.feather"],
+    },
+    'clean_rumah_tangga': {
+        'script': "data_cleaning/cleaning_rumah_tangga_data.py",
+        'inputs': ["data_cleaning/cleaning_rumah_tangga_data.py", "dataset_schema.py", "province_dimension.py",
+                   "data_cleaning/total_rumah_tangga_data.csv", "data_cleaning/kepemilikan_rumah_data.csv"],
+        'outputs': ["datasets/cleaned_rumah_tangga_data.csv", "datasets/cleaned_rumah_tangga_data.feather"],
+    },
+    'clean_ump': {
+        'script': "data_cleaning/cleaning_ump_data.py",
+        'inputs': ["data_cleaning/cleaning_ump_data.py", "dataset_schema.py", "province_dimension.py",
+                   "data_cleaning/ump_data.csv"],
+        'outputs': ["datasets/cleaned_ump_data.csv", "datasets/cleaned_ump_data.feather"],
+    },
+    'clustering': {
+        'script': "machine_learning/clustering.py",
+        'inputs': ["machine_learning/clustering.py", "dataset_schema.py", "province_dimension.py",
+                   "datasets/cleaned_ump_data.feather"],
+        'outputs': ["datasets/cluster.csv", "datasets/cluster.feather"],
+    },
+    'machine_learning': {
+        'script': "machine_learning/machine_learning.py",
+        'inputs': ["machine_learning/machine_learning.py", "machine_learning/tuning.py",
+                   "machine_learning/compact_forest.py", "machine_learning/inference.py", "dataset_schema.py",
+                   "datasets/cleaned_listing_data.feather"],
+        'outputs': ["machine_learning/rf_regressor_model.pkl", "machine_learning/rf_regressor_model_compact/*"],
+    },
+}
+
+# Stages that run at the same time at most
+num_workers = 4
+
+
+def stage_dependencies(stages):
+    """This function returns the stages every stage waits for: the ones that write one of its inputs."""
+    writers = {output: name for name, stage in stages.items() for output in stage['outputs']}
+    return {name: sorted({writers[path] for path in stage['inputs'] if path in writers} - {name})
+            for name, stage in stages.items()}
+
+
+def expand_paths(patterns, keep_missing=True):
+    """This function returns the files of a list of paths and glob patterns, and the missing paths with keep_missing."""
+    paths = []
+    for pattern in patterns:
+        if any(char in pattern for char in '*?['):
+            paths.extend(path.relative_to(current_dir).as_posix() for path in sorted(current_dir.glob(pattern)))
+        elif keep_missing or (current_dir / pattern).is_file():
+            paths.append(pattern)
+    return paths
+
+
+class Fingerprints:
+    """This class computes the SHA-256 of the files, and only reads a file again when its size or mtime changed."""
+
+    def __init__(self, known=None):
+        self.known = known or {}
+
+    def file(self, path):
+        stat = (current_dir / path).stat()
+        key = [stat.st_size, stat.st_mtime_ns]
+        if self.known.get(path, {}).get('stat') != key:
+            digest = hashlib.sha256()
+            with open(current_dir / path, 'rb') as file:
+                for block in iter(lambda: file.read(2 ** 20), b''):
+                    digest.update(block)
+            self.known[path] = {'stat': key, 'sha256': digest.hexdigest()}
+        return self.known[path]['sha256']
+
+    def files(self, paths):
+        """This function returns {path: SHA-256} of the files that exist, and None for the ones that do not."""
+        return {path: self.file(path) if (current_dir / path).is_file() else None for path in paths}
+
+
+def is_fresh(record, inputs, outputs):
+    """This function tells whether the outputs of a stage exist and are the ones of its last run on the same inputs."""
+    return (record is not None and record['inputs'] == inputs and record['outputs'] == outputs
+            and all(digest is not None for digest in outputs.values()))
+
+
+def run_stage(name, stage):
+    """This function runs the script of a stage from its directory, and writes what it prints to its log file."""
+    script = current_dir / stage['script']
+    log_path = log_dir / f"{name}.log"
+    start_time = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        process = subprocess.run([sys.executable, script.name], cwd=script.parent, stdout=log,
+                                 stderr=subprocess.STDOUT)
+    return process.returncode, time.perf_counter() - start_time
+
+
+def run_pipeline(stages, targets=None, force=False, num_workers=num_workers):
+    """This function runs the stages whose outputs are missing or stale, independent stages in parallel.
+
+    A stage is stale when the SHA-256 of one of its inputs or outputs differs from its last successful
+    run, so a stage that writes the same files as before does not make the next stages run again. With
+    `targets`, only these stages and the stages they depend on are considered. It returns the report
+    of every stage: its status ("ran", "fresh", "failed", "blocked" or "missing input") and seconds.
+    """
+    dependencies = stage_dependencies(stages)
+    selected = set(targets or stages)
+    pending = list(selected)
+    while pending:
+        for dependency in dependencies[pending.pop()]:
+            if dependency not in selected:
+                selected.add(dependency)
+                pending.append(dependency)
+
+    state = json.loads(state_path.read_text(encoding='utf-8')) if state_path.exists() else {}
+    fingerprints = Fingerprints(state.get('files'))
+    records = state.get('stages', {})
+    log_dir.mkdir(exist_ok=True)
+
+    report = {}
+    waiting = {name: set(dependencies[name]) & selected for name in stages if name in selected}
+    running = {}
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        while waiting or running:
+            for name in [name for name, needed in waiting.items() if not needed]:
+                del waiting[name]
+                stage = stages[name]
+                blocked = [dependency for dependency in dependencies[name]
+                           if report.get(dependency, {}).get('status') not in (None, 'ran', 'fresh')]
+                sources = expand_paths(stage.get('any_inputs', []), keep_missing=False)
+                inputs = fingerprints.files(expand_paths(stage['inputs']) + sources)
+                outputs = fingerprints.files(expand_paths(stage['outputs']))
+                missing = [path for path, digest in inputs.items() if digest is None]
+                if 'any_inputs' in stage and not sources:
+                    missing.append(' or '.join(stage['any_inputs']))
+                if blocked:
+                    report[name] = {'status': 'blocked', 'seconds': 0.0, 'detail': ', '.join(blocked)}
+                elif missing:
+                    report[name] = {'status': 'missing input', 'seconds': 0.0, 'detail': ', '.join(missing)}
+                elif not force and is_fresh(records.get(name), inputs, outputs):
+                    report[name] = {'status': 'fresh', 'seconds': 0.0, 'detail': ''}
+                else:
+                    print(f"Running {name} ({stage['script']})")
+                    running[executor.submit(run_stage, name, stage)] = (name, inputs)
+                    continue
+                for needed in waiting.values():
+                    needed.discard(name)
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, inputs = running.pop(future)
+                returncode, seconds = future.result()
+                if returncode == 0:
+                    outputs = fingerprints.files(expand_paths(stages[name]['outputs']))
+                    records[name] = {'inputs': inputs, 'outputs': outputs}
+                    report[name] = {'status': 'ran', 'seconds': seconds, 'detail': ''}
+                else:
+                    records.pop(name, None)
+                    report[name] = {'status': 'failed', 'seconds': seconds,
+                                    'detail': f"exit code {returncode}, see {(log_dir / f'{name}.log').name}"}
+                print(f"{name}: {report[name]['status']} in {seconds:.2f} seconds")
+                # The state is saved after every stage, so an interrupted run keeps the stages that finished
+                state_path.write_text(json.dumps({'stages': records, 'files': fingerprints.known}, indent=1),
+                                      encoding='utf-8')
+                for needed in waiting.values():
+                    needed.discard(name)
+
+    state_path.write_text(json.dumps({'stages': records, 'files': fingerprints.known}, indent=1), encoding='utf-8')
+    return report
+
+
+def print_report(report, elapsed):
+    """This function prints the status and the duration of every stage, and the time the parallel stages saved."""
+    print(f"\n{'stage':<20}{'status':<15}{'seconds':>9}  detail")
+    for name, result in report.items():
+        print(f"{name:<20}{result['status']:<15}{result['seconds']:>9.2f}  {result['detail']}")
+    stage_seconds = sum(result['seconds'] for result in report.values())
+    print(f"Total: {elapsed:.2f} seconds, {stage_seconds:.2f} seconds of stages")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the stale stages of the data pipeline, independent ones in "
+                                                 "parallel.")
+    parser.add_argument('stages', nargs='*',
+                        help=f"stages to bring up to date, with the stages they depend on: {', '.join(STAGES)} "
+                             f"(default: all)")
+    parser.add_argument('--force', action='store_true', help="run the stages even when their outputs are fresh")
+    parser.add_argument('--workers', type=int, default=num_workers, help="stages that run at the same time")
+    args = parser.parse_args()
+    unknown = [name for name in args.stages if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    start_time = time.perf_counter()
+    report = run_pipeline(STAGES, args.stages, args.force, args.workers)
+    print_report(report, time.perf_counter() - start_time)
+    sys.exit(0 if all(result['status'] in ('ran', 'fresh') for result in report.values()) else 1)
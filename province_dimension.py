@@ -0,0 +1,104 @@
+# Initialize library
+import difflib
+import re
+import numpy as np
+import pandas as pd
+
+# The provinces of Indonesia with their BPS codes, which the household data writes in front of the names
+# ("11. ACEH"). Every cleaned dataset carries the code in "provinsi_id", so the datasets are joined on it
+PROVINCES = {
+    11: 'Aceh', 12: 'Sumatera Utara', 13: 'Sumatera Barat', 14: 'Riau', 15: 'Jambi', 16: 'Sumatera Selatan',
+    17: 'Bengkulu', 18: 'Lampung', 19: 'Kepulauan Bangka Belitung', 21: 'Kepulauan Riau', 31: 'DKI Jakarta',
+    32: 'Jawa Barat', 33: 'Jawa Tengah', 34: 'DI Yogyakarta', 35: 'Jawa Timur', 36: 'Banten', 51: 'Bali',
+    52: 'Nusa Tenggara Barat', 53: 'Nusa Tenggara Timur', 61: 'Kalimantan Barat', 62: 'Kalimantan Tengah',
+    63: 'Kalimantan Selatan', 64: 'Kalimantan Timur', 65: 'Kalimantan Utara', 71: 'Sulawesi Utara',
+    72: 'Sulawesi Tengah', 73: 'Sulawesi Selatan', 74: 'Sulawesi Tenggara', 75: 'Gorontalo', 76: 'Sulawesi Barat',
+    81: 'Maluku', 82: 'Maluku Utara', 91: 'Papua Barat', 92: 'Papua Barat Daya', 93: 'Papua Selatan', 94: 'Papua',
+    95: 'Papua Tengah', 96: 'Papua Pegunungan',
+}
+
+# Other names of the provinces, by normalized name
+PROVINCE_ALIASES = {
+    'daerah istimewa yogyakarta': 34,
+    'yogyakarta': 34,
+    'dki': 31,
+    'jakarta': 31,
+    'daerah khusus ibukota jakarta': 31,
+    'bangka belitung': 19,
+    'kep bangka belitung': 19,
+    'kep riau': 21,
+    'ntb': 52,
+    'ntt': 53,
+    'sumatra utara': 12,
+    'sumatra barat': 13,
+    'sumatra selatan': 16,
+}
+
+# Code of the rows without a province, such as the listings of an unknown city. It is not in PROVINCES
+unknown_province_id = 0
+
+# Fuzzy matches only correct typos, like in data_cleaning/province_resolver.py: the name has at least
+# fuzzy_min_length characters, is at least this similar to a known province and differs from it by one character
+fuzzy_cutoff = 0.9
+fuzzy_min_length = 8
+
+
+def normalize_province(name):
+    """This function turns a province name into the key of the index: no BPS code in front, no dots, lower case."""
+    name = re.sub(r'^\d+\.\s*', '', str(name))
+    return ' '.join(name.replace('.', ' ').casefold().split())
+
+
+PROVINCE_INDEX = {normalize_province(name): code for code, name in PROVINCES.items()}
+PROVINCE_INDEX.update({alias: code for alias, code in PROVINCE_ALIASES.items() if alias not in PROVINCE_INDEX})
+
+
+def edit_count(a, b):
+    """This function returns the number of characters that are inserted, deleted or replaced between two names."""
+    return sum(max(i2 - i1, j2 - j1) for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b).get_opcodes()
+               if tag != 'equal')
+
+
+def province_table():
+    """This function returns the province dimension: the code and the canonical name of every province."""
+    return pd.DataFrame({'provinsi_id': pd.Series(list(PROVINCES), dtype='int8'),
+                         'provinsi': list(PROVINCES.values())})
+
+
+def province_codes(names, allow_missing=False):
+    """This function returns the codes of a column of province names as an int8 array.
+
+    Only the distinct names are normalized and looked up, then the codes are joined back to the rows.
+    Names that are not known are matched to the most similar province when they only differ by a typo,
+    and every fuzzy match is printed, so it can be added to PROVINCE_ALIASES. A name that matches none of
+    them raises a ValueError, so a misspelt province can not silently drop out of a join. With
+    `allow_missing`, missing names get the unknown_province_id.
+    """
+    codes, names = pd.factorize(names)
+    unique_codes = []
+    unknown = []
+    for name in names:
+        key = normalize_province(name)
+        if key not in PROVINCE_INDEX:
+            matches = difflib.get_close_matches(key, PROVINCE_INDEX, n=1, cutoff=fuzzy_cutoff)
+            if len(key) < fuzzy_min_length or not matches or edit_count(key, matches[0]) > 1:
+                unknown.append(name)
+                continue
+            print(f"Fuzzy match: {name!r} is resolved to {PROVINCES[PROVINCE_INDEX[matches[0]]]}, "
+                  f"add it to PROVINCE_ALIASES if it is right")
+            key = matches[0]
+        unique_codes.append(PROVINCE_INDEX[key])
+    if unknown:
+        raise ValueError(f"Unknown provinces: {', '.join(map(str, unknown))}")
+    if (codes == -1).any() and not allow_missing:
+        raise ValueError("Missing provinces")
+    # Missing names have the code -1, which takes the unknown_province_id at the end
+    return np.array(unique_codes + [unknown_province_id], dtype=np.int8)[codes]
+
+
+def add_province_codes(df, allow_missing=False):
+    """This function replaces the "provinsi" column with the canonical names and puts the codes before it."""
+    codes = province_codes(df['provinsi'], allow_missing)
+    df = df.assign(provinsi=pd.Series(PROVINCES).reindex(codes).to_numpy())
+    df.insert(df.columns.get_loc('provinsi'), 'provinsi_id', codes)
+    return df
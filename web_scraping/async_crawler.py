@@ -0,0 +1,284 @@
+import asyncio
+import random
+import sys
+import time
+from urllib.parse import urlsplit
+import aiohttp
+from http_extractor import DEFAULT_HEADERS
+from page_parser import DETAIL_FIELDS, parse_listing_page, parse_detail_page, detail_row, page_link
+from row_writer import RowWriter
+from fingerprint_index import FingerprintIndex
+from stage_timer import NULL_TIMER
+from crawl_logging import CrawlLogger
+from http_cache import HttpCache
+
+
+# --- CONFIG ---
+link = 'put-your-link-in-here'
+
+# Maximum number of requests in flight at the same time, over all hosts
+concurrency = 32
+
+# Requests per second allowed for each host, and how many of them may be sent in a burst
+rate_per_host = 8.0
+burst_per_host = 16
+
+# Number of retries of a failed request, the waiting time doubles after every attempt
+retries = 4
+backoff = 1.0
+
+# Also save the rows as "parquet" or "feather" part files next to the CSV files
+part_format = None
+
+# Fingerprints of every listing ever collected, set it to None to scrape every listing again
+fingerprint_index_path = "fingerprint_index.sqlite"
+
+# Pages of the previous crawls, revalidated with conditional requests, set it to None to disable the cache
+http_cache_path = "http_cache.sqlite"
+http_cache_max_mb = 512
+
+# JSON log of the crawl, with sampled records and counters instead of a line per field
+log_path = "logs_async_crawler.log"
+
+# Highest page of a city that is fetched, None fetches every page. A recorded corpus only has the first pages
+max_pages = None
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """This class lets through at most `rate` requests per second, with bursts of up to `capacity` requests."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncCrawler:
+    """This class crawls the sitemap, province, city and property's pages with asyncio.
+
+    Every request goes through a global concurrency ceiling and the token bucket of its host,
+    and failed requests are retried with exponential backoff. The rows have the same columns
+    as the ones written by scraping.py. Pages of previous crawls are kept in an HttpCache and
+    served locally when the server answers that they did not change.
+    """
+
+    def __init__(self, concurrency=concurrency, rate_per_host=rate_per_host, burst_per_host=burst_per_host,
+                 retries=retries, backoff=backoff, timeout=30, part_format=part_format,
+                 fingerprint_index_path=fingerprint_index_path, timer=NULL_TIMER, log_path=log_path,
+                 http_cache_path=http_cache_path, http_cache_max_bytes=http_cache_max_mb * 2 ** 20,
+                 max_pages=max_pages):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.rate_per_host = rate_per_host
+        self.burst_per_host = burst_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.part_format = part_format
+        self.max_pages = max_pages
+        self.timer = timer
+        self.fingerprints = FingerprintIndex(fingerprint_index_path) if fingerprint_index_path else None
+        self.cache = HttpCache(http_cache_path, http_cache_max_bytes) if http_cache_path else None
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.buckets = {}
+        self.session = None
+        self.log_path = log_path
+        self.logger = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=0, ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector, headers=DEFAULT_HEADERS, timeout=self.timeout)
+        self.logger = CrawlLogger('async_crawler', self.log_path)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+        if self.cache is not None:
+            self.logger.info("HTTP cache statistics", cache=self.cache.summary())
+            self.cache.close()
+        self.logger.close()
+        if self.fingerprints is not None:
+            self.fingerprints.close()
+
+    def bucket(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate_per_host, self.burst_per_host)
+        return self.buckets[host]
+
+    async def fetch(self, url):
+        """This function downloads a page, retrying connection errors and 429/5xx answers with backoff.
+
+        A cached page is requested conditionally and served from the cache when it did not change.
+        """
+        entry = self.cache.lookup(url) if self.cache is not None else None
+        if self.cache is not None and self.cache.is_fresh(entry):
+            return self.cache.hit(url, entry, revalidated=False)
+        for attempt in range(self.retries + 1):
+            await self.bucket(url).acquire()
+            try:
+                async with self.semaphore:
+                    start_time = time.perf_counter()
+                    async with self.session.get(url, headers=HttpCache.request_headers(entry)) as response:
+                        if entry is not None and response.status == 304:
+                            return self.cache.hit(url, entry, time.perf_counter() - start_time)
+                        if response.status not in RETRY_STATUSES:
+                            response.raise_for_status()
+                            text = await response.text()
+                            if self.cache is not None:
+                                self.cache.store(url, text, response.headers, time.perf_counter() - start_time, entry)
+                            return text
+                        retry_after = response.headers.get('Retry-After')
+                error = f"HTTP {response.status}"
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as exception:
+                retry_after = None
+                error = f"{type(exception).__name__}: {exception}"
+
+            if attempt == self.retries:
+                raise RuntimeError(f"Giving up on {url} after {attempt + 1} attempts ({error})")
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else self.backoff * 2 ** attempt
+            delay += random.uniform(0, self.backoff)
+            self.logger.warning("Retrying the request", url=url, delay=round(delay, 1), error=error)
+            self.logger.count('retries')
+            await asyncio.sleep(delay)
+
+    async def scrape_listing(self, listing, writer):
+        """This function completes a listing of a city page with the fields of its property's page and writes it.
+
+        A property's page that answers with a 4xx status, such as a delisted house, is counted as missing
+        and skipped. It returns the number of written houses, 1 or 0.
+        """
+        row = {'judul': listing['judul'], 'lokasi': listing['lokasi']}
+        try:
+            with self.timer.stage('extraction'):
+                row.update(detail_row(parse_detail_page(await self.fetch(listing['link']))))
+        except aiohttp.ClientResponseError as exception:
+            if not 400 <= exception.status < 500:
+                raise
+            self.logger.warning("The house is missing", url=listing['link'], status=exception.status)
+            self.logger.count('listings_missing')
+            return 0
+        row['harga'] = listing['harga']
+        row['link'] = listing['link']
+        # The row goes to the writer as soon as the house is done, which writes it with the next batch
+        with self.timer.stage('write'):
+            writer.write(row, key=(row['link'], row['judul'], row['lokasi'], row['harga']))
+        self.logger.info("The house was extracted", stage='extraction', url=listing['link'])
+        self.logger.count('fields_missing', sum(row[column] == "0" for column in DETAIL_FIELDS))
+        self.logger.count('listings_ok')
+        return 1
+
+    async def fetch_page(self, url):
+        """This function downloads and parses a listing page, a page that answers with a 4xx status is empty."""
+        try:
+            with self.timer.stage('navigation'):
+                page = parse_listing_page(await self.fetch(url), url)
+        except aiohttp.ClientResponseError as exception:
+            if not 400 <= exception.status < 500:
+                raise
+            self.logger.warning("The page is missing", url=url, status=exception.status)
+            self.logger.count('pages_missing')
+            return parse_listing_page('', url)
+        self.logger.count('pages')
+        return page
+
+    async def scrape_city(self, city_link, writer):
+        """This function fetches the pages of a city and scrapes all of their new listings concurrently.
+
+        The first page tells the number of pages when the pagination is numbered, the other pages
+        are then fetched all at once. A pagination that only shows the pages around the current one
+        is extended with the highest page number of the fetched pages, until no new page shows up.
+        Cities without numbered pages are walked through their "next" links. A missing page is skipped,
+        and a listing that fails is logged and counted without stopping the others. It returns the
+        number of written houses. With `max_pages`, the pages after it are not fetched.
+        """
+        limit = self.max_pages or sys.maxsize
+        pages = [await self.fetch_page(city_link)]
+        last_page = pages[0]['last_page']
+        if last_page is None:
+            while pages[-1]['next_link'] and len(pages) < limit:
+                pages.append(await self.fetch_page(pages[-1]['next_link']))
+        while last_page is not None and min(last_page, limit) > len(pages):
+            pages += await asyncio.gather(*(self.fetch_page(page_link(city_link, page))
+                                            for page in range(len(pages) + 1, min(last_page, limit) + 1)))
+            last_page = max(page['last_page'] or 0 for page in pages)
+
+        listings = [listing for page in pages for listing in page['listings']]
+        new_listings = [listing for listing in listings
+                        if self.fingerprints is None or self.fingerprints.claim(
+                            listing['link'], listing['judul'], listing['lokasi'], listing['harga'])]
+        self.logger.count('listings_known', len(listings) - len(new_listings))
+        results = await asyncio.gather(*(self.scrape_listing(listing, writer) for listing in new_listings),
+                                       return_exceptions=True)
+        for listing, result in zip(new_listings, results):
+            if isinstance(result, Exception):
+                self.logger.warning("The house could not be scraped", url=listing['link'],
+                                    error=f"{type(result).__name__}: {result}")
+                self.logger.count('listings_failed')
+        return sum(result for result in results if not isinstance(result, Exception))
+
+    async def scrape_province(self, province, province_link):
+        """This function scrapes every city of a province into the province's CSV file.
+
+        The rows are written in batches while the listings finish, so the houses of a province that is
+        interrupted are on disk. A city that fails is logged and counted, and does not stop the others.
+        """
+        start_time = time.time()
+        total_houses = 0
+        on_flush = None if self.fingerprints is None else self.fingerprints.add_many
+        # With the fingerprint index only new listings are scraped, so they are added to the existing file
+        with RowWriter(f"house_scraping_pagination_{province}.csv", append=self.fingerprints is not None,
+                       part_format=self.part_format, on_flush=on_flush) as writer:
+            try:
+                with self.timer.stage('navigation'):
+                    cities = parse_listing_page(await self.fetch(province_link), province_link)['cities']
+            except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError) as exception:
+                self.logger.warning("The province could not be opened", province=province,
+                                    error=f"{type(exception).__name__}: {exception}")
+                self.logger.count('provinces_failed')
+                cities = []
+            results = await asyncio.gather(*(self.scrape_city(city_link, writer) for city_link in cities),
+                                           return_exceptions=True)
+            for city_link, result in zip(cities, results):
+                if isinstance(result, Exception):
+                    self.logger.warning("The city could not be scraped", city=city_link,
+                                        error=f"{type(result).__name__}: {result}")
+                    self.logger.count('cities_failed')
+                else:
+                    total_houses += result
+        self.logger.info("The province is done", province=province, houses=total_houses)
+        return province, total_houses, time.time() - start_time
+
+    async def crawl(self, sitemap_link):
+        """This function scrapes every province of the sitemap and reports them as soon as they are finished."""
+        provinces = parse_listing_page(await self.fetch(sitemap_link), sitemap_link)['provinces']
+        tasks = [self.scrape_province(province, province_link) for province, province_link in enumerate(provinces)]
+        for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+            province, houses, elapsed = await task
+            print(f"[{done}/{len(tasks)}] Province {province} is done: {houses} houses in {elapsed:.0f} seconds")
+
+
+async def main(sitemap_link):
+    async with AsyncCrawler() as crawler:
+        await crawler.crawl(sitemap_link)
+        if crawler.cache is not None:
+            print(f"HTTP cache: {crawler.cache.summary()}")
+
+
+if __name__ == "__main__":
+    # The sitemap link can be given on the command line, e.g. the address of a local stand-in server
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else link))
+    print("Scraping is Done!!")
@@ -0,0 +1,214 @@
+import argparse
+import asyncio
+import csv
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from replay import Corpus, build_synthetic_corpus, serve_corpus
+from stage_timer import StageTimer
+
+ENGINES = ['async', 'http', 'selenium', 'selenium-http']
+
+
+# Cache of the engines when the benchmark is run with --warm-cache
+CACHE_PATH = "http_cache.sqlite"
+
+
+def run_async(start_link, timer, cache_path, max_pages):
+    from async_crawler import AsyncCrawler
+
+    async def crawl():
+        # The replay server is local, so the rate limit is lifted to measure the crawler itself
+        async with AsyncCrawler(rate_per_host=1e6, burst_per_host=1e6, fingerprint_index_path=None,
+                                timer=timer, http_cache_path=cache_path, max_pages=max_pages) as crawler:
+            await crawler.crawl(start_link)
+            return crawler.cache.summary() if crawler.cache is not None else None
+
+    return asyncio.run(crawl())
+
+
+def run_http(start_link, timer, cache_path, max_pages):
+    """This engine walks the pages one by one with the pooled HTTP session of the detail extractor."""
+    from http_extractor import HttpDetailExtractor
+    from page_parser import parse_listing_page, parse_detail_page, detail_row
+    from row_writer import RowWriter
+
+    with HttpDetailExtractor(cache_path=cache_path) as extractor:
+        with timer.stage('navigation'):
+            provinces = parse_listing_page(extractor.fetch(start_link), start_link)['provinces']
+        for province, province_link in enumerate(provinces):
+            with RowWriter(f"house_scraping_pagination_{province}.csv") as writer:
+                with timer.stage('navigation'):
+                    cities = parse_listing_page(extractor.fetch(province_link), province_link)['cities']
+                for page_link in cities:
+                    for _ in range(max_pages or sys.maxsize):
+                        if not page_link:
+                            break
+                        with timer.stage('navigation'):
+                            page = parse_listing_page(extractor.fetch(page_link), page_link)
+                        for listing in page['listings']:
+                            with timer.stage('extraction'):
+                                detail = detail_row(parse_detail_page(extractor.fetch(listing['link'])))
+                            with timer.stage('write'):
+                                writer.write({**listing, **detail})
+                        page_link = page['next_link']
+        return extractor.cache.summary() if extractor.cache is not None else None
+
+
+def run_selenium(start_link, timer, engine, cache_path, max_pages):
+    import scraping
+
+    scraping.link = start_link
+    scraping.engine = engine
+    scraping.http_cache_path = cache_path
+    scraping.max_pages = max_pages
+    for task in enumerate(scraping.get_provinces()):
+        error = scraping.scrape_province(task, timer)[3]
+        if error is not None:
+            raise RuntimeError(error)
+
+
+def run_engine(engine, start_link, cache_path=None, max_pages=None):
+    """This function runs one engine in the current directory and returns its measurements.
+
+    `max_pages` stops every city at the last page of a recorded corpus, whose pagination links further.
+    """
+    timer = StageTimer()
+    tracemalloc.start()
+    start_time = time.perf_counter()
+
+    cache = None
+    if engine == 'async':
+        cache = run_async(start_link, timer, cache_path, max_pages)
+    elif engine == 'http':
+        cache = run_http(start_link, timer, cache_path, max_pages)
+    else:
+        run_selenium(start_link, timer, 'http' if engine == 'selenium-http' else 'selenium', cache_path, max_pages)
+
+    elapsed = time.perf_counter() - start_time
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    listings = 0
+    for path in Path.cwd().glob("house_scraping_pagination_*.csv"):
+        with open(path, encoding="utf-8", newline="") as file:
+            listings += sum(1 for _ in csv.reader(file, delimiter=';')) - 1
+
+    return {
+        'engine': engine,
+        'listings': listings,
+        'seconds': round(elapsed, 3),
+        'listings_per_second': round(listings / elapsed, 2),
+        'peak_python_memory_mb': round(peak_memory / 2 ** 20, 2),
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+        'stages': timer.summary(),
+        'cache': cache,
+    }
+
+
+def benchmark(engines, corpus_dir, latency, warm_cache=False):
+    """This function serves the corpus and runs every engine in its own process and working directory.
+
+    With `warm_cache`, every engine crawls the corpus once to fill its HTTP cache, and the second
+    crawl, which revalidates the cached pages, is measured.
+    """
+    server, start_link = serve_corpus(corpus_dir, latency=latency)
+    results = []
+    command = [sys.executable, str(Path(__file__).resolve()), '--start', start_link]
+    max_pages = Corpus(corpus_dir).manifest.get('max_pages')
+    if max_pages:
+        command += ['--max-pages', str(max_pages)]
+    if warm_cache:
+        command += ['--cache', CACHE_PATH]
+    try:
+        for engine in engines:
+            with tempfile.TemporaryDirectory() as work_dir:
+                if warm_cache:
+                    subprocess.run(command + ['--run-engine', engine], cwd=work_dir, capture_output=True)
+                    # Only the cache is kept, the output files and crawl state of the first crawl are removed
+                    for path in Path(work_dir).iterdir():
+                        if not path.name.startswith(CACHE_PATH):
+                            path.unlink()
+                process = subprocess.run(command + ['--run-engine', engine], cwd=work_dir,
+                                         capture_output=True, text=True)
+            if process.returncode != 0:
+                error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else 'unknown error'
+                results.append({'engine': engine, 'skipped': error})
+                continue
+            results.append(json.loads(process.stdout.strip().splitlines()[-1]))
+    finally:
+        server.shutdown()
+    return results
+
+
+def print_results(results):
+    print(f"{'engine':<14}{'listings':>10}{'seconds':>10}{'listings/s':>12}{'peak py MB':>12}{'max RSS MB':>12}")
+    for result in results:
+        if 'skipped' in result:
+            print(f"{result['engine']:<14} skipped: {result['skipped']}")
+            continue
+        print(f"{result['engine']:<14}{result['listings']:>10}{result['seconds']:>10.2f}"
+              f"{result['listings_per_second']:>12.1f}{result['peak_python_memory_mb']:>12.1f}"
+              f"{result['max_rss_mb']:>12.1f}")
+        for stage, summary in result['stages'].items():
+            print(f"    {stage:<12} n={summary['count']:<6} mean={summary['mean_ms']:.2f} ms "
+                  f"p50={summary['p50_ms']:.2f} ms p95={summary['p95_ms']:.2f} ms")
+        if result.get('cache'):
+            cache = result['cache']
+            print(f"    cache        hit rate={cache['hit_rate']:.0%} downloaded={cache['mb_downloaded']} MB "
+                  f"saved={cache['mb_saved']} MB, about {cache['seconds_saved']} s of downloads")
+
+
+def find_regressions(results, baseline, tolerance):
+    """This function lists the engines whose throughput dropped more than `tolerance` below the baseline."""
+    baseline = {result['engine']: result for result in baseline if 'skipped' not in result}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['engine'])
+        if previous and 'skipped' not in result:
+            if result['listings_per_second'] < previous['listings_per_second'] * (1 - tolerance):
+                regressions.append(f"{result['engine']}: {result['listings_per_second']} listings/s, "
+                                   f"baseline {previous['listings_per_second']} listings/s")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scraping engines against a replayed corpus.")
+    parser.add_argument('--engines', default=','.join(ENGINES), help="comma separated engines to run")
+    parser.add_argument('--corpus', help="recorded corpus directory (default: a generated corpus)")
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="latency added to every answer")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="fail when an engine is slower than in this JSON file")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown against the baseline")
+    parser.add_argument('--warm-cache', action='store_true', help="measure a re-crawl with a filled HTTP cache")
+    parser.add_argument('--run-engine', help=argparse.SUPPRESS)
+    parser.add_argument('--start', help=argparse.SUPPRESS)
+    parser.add_argument('--cache', help=argparse.SUPPRESS)
+    parser.add_argument('--max-pages', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_engine:
+        # Child process: run one engine and print its measurements as JSON
+        print(json.dumps(run_engine(args.run_engine, args.start, args.cache, args.max_pages)))
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as synthetic_dir:
+        corpus_dir = args.corpus
+        if corpus_dir is None:
+            build_synthetic_corpus(synthetic_dir)
+            corpus_dir = synthetic_dir
+        results = benchmark(args.engines.split(','), corpus_dir, args.latency_ms / 1000, args.warm_cache)
+
+    print_results(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=1))
+    if args.baseline:
+        regressions = find_regressions(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,65 @@
+import time
+from pathlib import Path
+from fixture_server import serve_directory
+from http_extractor import HttpDetailExtractor
+
+# --- PATH SETTINGS ---
+current_dir = Path(__file__).parent if "__file__" in locals() else Path.cwd()
+fixtures_dir = current_dir / "fixtures"
+
+# --- CONFIG ---
+# Number of detail pages extracted by each engine
+num_listings = 200
+fixture_pages = ["detail_page.html", "detail_page_missing_fields.html"]
+
+
+def benchmark_http(urls):
+    """This function extracts every URL with the pooled HTTP session and returns the rows and elapsed time."""
+    start_time = time.perf_counter()
+    with HttpDetailExtractor() as extractor:
+        rows = [extractor.extract(url) for url in urls]
+    return rows, time.perf_counter() - start_time
+
+
+def benchmark_selenium(urls):
+    """This function extracts every URL with a Chrome window per listing, like scraping.py does."""
+    from scraping import init_driver, extract_details
+
+    driver = init_driver()
+    list_window = driver.current_window_handle
+    start_time = time.perf_counter()
+    rows = []
+    for url in urls:
+        # Open the property's page in a new window, extract it and close it again
+        driver.switch_to.new_window('tab')
+        driver.get(url)
+        kamar_tidur, kamar_mandi, luas_bangunan, luas_tanah = extract_details(driver)
+        rows.append({'kamar_tidur': kamar_tidur, 'kamar_mandi': kamar_mandi,
+                     'luas_bangunan': luas_bangunan, 'luas_tanah': luas_tanah})
+        driver.close()
+        driver.switch_to.window(list_window)
+    elapsed = time.perf_counter() - start_time
+    driver.quit()
+    return rows, elapsed
+
+
+if __name__ == "__main__":
+    server, base_url = serve_directory(fixtures_dir)
+    urls = [f"{base_url}/{fixture_pages[i % len(fixture_pages)]}" for i in range(num_listings)]
+
+    http_rows, http_time = benchmark_http(urls)
+    print(f"HTTP engine    : {len(urls)} listings in {http_time:.2f} seconds "
+          f"({http_time / len(urls) * 1000:.1f} ms per listing)")
+
+    try:
+        # Every missing field waits out the implicit wait, so the Selenium path only gets a few pages
+        selenium_urls = urls[:10]
+        selenium_rows, selenium_time = benchmark_selenium(selenium_urls)
+    except Exception as error:
+        print(f"Selenium engine: skipped ({type(error).__name__}: {error})")
+    else:
+        print(f"Selenium engine: {len(selenium_urls)} listings in {selenium_time:.2f} seconds "
+              f"({selenium_time / len(selenium_urls) * 1000:.1f} ms per listing)")
+        print(f"Both engines produce the same rows: {selenium_rows == http_rows[:len(selenium_rows)]}")
+
+    server.shutdown()
@@ -0,0 +1,94 @@
+import json
+import logging
+import queue
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has, everything else was passed with `extra` and ends up in the JSON record
+STANDARD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+# Share of the records of a stage that is written, the stages that are not listed are always written
+DEFAULT_SAMPLING = {'navigation': 0.1, 'extraction': 0.01, 'write': 0.0}
+
+
+class JsonFormatter(logging.Formatter):
+    """This formatter writes every record as one JSON line, with the fields given in `extra`."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in STANDARD_ATTRIBUTES})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """This filter only lets through a share of the records of every stage, warnings and errors always pass."""
+
+    def __init__(self, sampling):
+        super().__init__()
+        self.sampling = sampling
+        self.seen = Counter()
+
+    def filter(self, record):
+        stage = getattr(record, 'stage', None)
+        if record.levelno >= logging.WARNING or stage not in self.sampling:
+            return True
+        rate = self.sampling[stage]
+        if rate <= 0:
+            return False
+        # Deterministic sampling: the first record of a stage and then every 1/rate-th one
+        self.seen[stage] += 1
+        return (self.seen[stage] - 1) % round(1 / rate) == 0
+
+
+class CrawlLogger:
+    """This class logs a crawl through a queue, so the crawl never waits for the log file.
+
+    The records are written as JSON lines by a background thread. Instead of a line for every
+    field, the crawl increments counters (listings ok, fields missing, pages, ...), which are
+    written as one summary record every `summary_every` listings and at the end.
+    """
+
+    def __init__(self, name, path, sampling=DEFAULT_SAMPLING, summary_every=100, level=logging.INFO):
+        self.counters = Counter()
+        self.summary_every = summary_every
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(level)
+        self.logger.propagate = False
+
+        handler = logging.FileHandler(path, mode='w', encoding='utf-8')
+        handler.setFormatter(JsonFormatter())
+        log_queue = queue.SimpleQueue()
+        queue_handler = QueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter(sampling))
+        self.logger.handlers = [queue_handler]
+        self.listener = QueueListener(log_queue, handler)
+        self.listener.start()
+
+    def info(self, message, **fields):
+        self.logger.info(message, extra=fields)
+
+    def warning(self, message, **fields):
+        self.logger.warning(message, extra=fields)
+
+    def count(self, name, amount=1):
+        """This function increments a counter, and writes a summary every `summary_every` listings."""
+        self.counters[name] += amount
+        if name == 'listings_ok' and self.counters[name] % self.summary_every == 0:
+            self.summary()
+
+    def summary(self, message="Crawl progress"):
+        self.logger.info(message, extra={'counters': dict(self.counters)})
+
+    def close(self):
+        """This function writes the final summary and waits until every record is on disk."""
+        self.summary("Crawl finished")
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
@@ -0,0 +1,67 @@
+import sqlite3
+
+
+class CrawlState:
+    """This class stores the progress of the crawl in a SQLite file, so a restarted crawl resumes where it stopped.
+
+    It records the finished provinces, cities and pagination pages, and every listing URL
+    that has already been written to a CSV file. The file is shared by the worker processes,
+    every worker opens its own connection.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS provinces (province TEXT PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS cities (province TEXT, city TEXT, PRIMARY KEY (province, city));
+            CREATE TABLE IF NOT EXISTS pages (province TEXT, city TEXT, page INTEGER, PRIMARY KEY (province, city, page));
+            CREATE TABLE IF NOT EXISTS listings (url TEXT PRIMARY KEY, province TEXT, city TEXT, page INTEGER);
+        """)
+        self.connection.commit()
+
+    def _exists(self, query, params):
+        return self.connection.execute(query, params).fetchone() is not None
+
+    def _insert(self, query, params):
+        with self.connection:
+            self.connection.execute(query, params)
+
+    def has_started(self, province):
+        """This function checks whether anything of the province has already been scraped."""
+        return self._exists("SELECT 1 FROM cities WHERE province = ? UNION SELECT 1 FROM listings WHERE province = ?",
+                            (str(province), str(province)))
+
+    def is_province_done(self, province):
+        return self._exists("SELECT 1 FROM provinces WHERE province = ?", (str(province),))
+
+    def mark_province_done(self, province):
+        self._insert("INSERT OR IGNORE INTO provinces VALUES (?)", (str(province),))
+
+    def is_city_done(self, province, city):
+        return self._exists("SELECT 1 FROM cities WHERE province = ? AND city = ?", (str(province), city))
+
+    def mark_city_done(self, province, city):
+        self._insert("INSERT OR IGNORE INTO cities VALUES (?, ?)", (str(province), city))
+
+    def is_page_done(self, province, city, page):
+        return self._exists("SELECT 1 FROM pages WHERE province = ? AND city = ? AND page = ?",
+                            (str(province), city, page))
+
+    def mark_page_done(self, province, city, page):
+        self._insert("INSERT OR IGNORE INTO pages VALUES (?, ?, ?)", (str(province), city, page))
+
+    def has_listing(self, url):
+        return self._exists("SELECT 1 FROM listings WHERE url = ?", (url,))
+
+    def add_listing(self, url, province, city, page):
+        self._insert("INSERT OR IGNORE INTO listings VALUES (?, ?, ?, ?)", (url, str(province), city, page))
+
+    def add_listings(self, listings):
+        """This function records many (url, province, city, page) tuples in one transaction."""
+        with self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO listings VALUES (?, ?, ?, ?)",
+                                        [(url, str(province), city, page) for url, province, city, page in listings])
+
+    def close(self):
+        self.connection.close()
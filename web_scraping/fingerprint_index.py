@@ -0,0 +1,70 @@
+import hashlib
+import sqlite3
+from urllib.parse import urlsplit, urlunsplit
+
+
+def normalize_url(url):
+    """This function drops the parts of a listing URL that do not change the listing (case of the host, fragment, trailing "/")."""
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), parts.query, ''))
+
+
+def digest(text):
+    """This function turns a key into a signed 64-bit integer, which SQLite stores in 8 bytes."""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+class FingerprintIndex:
+    """This class remembers every listing that has been scraped, across runs, in a SQLite hash set.
+
+    A listing is known by two fingerprints: its URL and its title + address + price. The scraper
+    checks both before it opens a property's page, so a listing that shows up under several cities
+    or pages, or that was collected by a previous crawl, is only fetched once. Fingerprints are
+    claimed in memory while a listing is being scraped and only written to disk with `add_many`,
+    once the rows are safely in the CSV file.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS fingerprints (digest INTEGER PRIMARY KEY)")
+        self.connection.commit()
+        self.claimed = set()
+
+    @staticmethod
+    def fingerprints(url=None, judul=None, lokasi=None, harga=None):
+        keys = []
+        if url:
+            keys.append(digest('url:' + normalize_url(url)))
+        if judul and lokasi and harga:
+            content = '\x1f'.join(' '.join(value.casefold().split()) for value in (judul, lokasi, harga))
+            keys.append(digest('content:' + content))
+        return keys
+
+    def seen(self, url=None, judul=None, lokasi=None, harga=None):
+        """This function checks whether the listing was already scraped, now or in a previous run."""
+        keys = self.fingerprints(url, judul, lokasi, harga)
+        if any(key in self.claimed for key in keys):
+            return True
+        query = f"SELECT 1 FROM fingerprints WHERE digest IN ({', '.join('?' * len(keys))}) LIMIT 1"
+        return bool(keys) and self.connection.execute(query, keys).fetchone() is not None
+
+    def claim(self, url=None, judul=None, lokasi=None, harga=None):
+        """This function returns False for a known listing, otherwise it reserves the listing and returns True."""
+        if self.seen(url, judul, lokasi, harga):
+            return False
+        self.claimed.update(self.fingerprints(url, judul, lokasi, harga))
+        return True
+
+    def add_many(self, listings):
+        """This function stores the fingerprints of many (url, judul, lokasi, harga) tuples in one transaction."""
+        keys = [(key,) for listing in listings for key in self.fingerprints(*listing)]
+        with self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO fingerprints VALUES (?)", keys)
+        self.claimed.difference_update(key for key, in keys)
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
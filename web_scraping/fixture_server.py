@@ -0,0 +1,21 @@
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from pathlib import Path
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """This handler serves files without printing a line for every request."""
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_directory(directory, handler=QuietHandler):
+    """This function serves a directory on a free local port and returns the server and its base URL.
+
+    The server runs in a daemon thread, call server.shutdown() when you are done with it.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(handler, directory=str(Path(directory))))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
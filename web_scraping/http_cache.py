@@ -0,0 +1,130 @@
+import sqlite3
+import time
+import zlib
+from collections import Counter
+
+
+class HttpCache:
+    """This class keeps the pages downloaded by the scrapers in SQLite, so a re-crawl only downloads what changed.
+
+    Every page is stored by URL with its (compressed) body, its ETag and Last-Modified headers, the
+    time it was fetched and how long its download took. A cached page is revalidated with a conditional request, and when the
+    server answers 304 Not Modified the body is served from the cache. Pages younger than `max_age`
+    seconds are served without any request. When the bodies take more than `max_bytes`, the pages
+    that were used the longest time ago are evicted.
+    """
+
+    def __init__(self, path, max_bytes=512 * 2 ** 20, max_age=0):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS responses (
+            url TEXT PRIMARY KEY, body BLOB, etag TEXT, last_modified TEXT,
+            fetched_at REAL, used_at REAL, size INTEGER, seconds REAL)""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+        self.connection.commit()
+        # Running estimate of the size of the bodies, recounted in SQLite before evicting
+        # because other processes may share the cache
+        self.total = self.size()
+        self.stats = Counter()
+        self.seconds_saved = 0.0
+
+    def lookup(self, url):
+        """This function returns the cached page of a URL as a dict, or None when it is not cached."""
+        row = self.connection.execute("SELECT body, etag, last_modified, fetched_at, size, seconds FROM responses "
+                                      "WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        body, etag, last_modified, fetched_at, size, seconds = row
+        return {'body': body, 'etag': etag, 'last_modified': last_modified, 'fetched_at': fetched_at, 'size': size,
+                'seconds': seconds}
+
+    def is_fresh(self, entry):
+        return entry is not None and time.time() - entry['fetched_at'] < self.max_age
+
+    @staticmethod
+    def request_headers(entry):
+        """This function returns the headers that make the request conditional on the cached page."""
+        headers = {}
+        if entry is not None and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry is not None and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def hit(self, url, entry, seconds=0.0, revalidated=True):
+        """This function serves a cached page, after a 304 answer or because it is still fresh.
+
+        `seconds` is the duration of the conditional request, the time saved is the difference with
+        the duration of the full download.
+        """
+        now = time.time()
+        with self.connection:
+            if revalidated:
+                self.connection.execute("UPDATE responses SET fetched_at = ?, used_at = ? WHERE url = ?", (now, now, url))
+            else:
+                self.connection.execute("UPDATE responses SET used_at = ? WHERE url = ?", (now, url))
+        self.stats['hits'] += 1
+        self.stats['revalidated' if revalidated else 'fresh'] += 1
+        body = zlib.decompress(entry['body'])
+        self.stats['bytes_saved'] += len(body)
+        self.seconds_saved += max(entry['seconds'] - seconds, 0.0)
+        return body.decode('utf-8')
+
+    def store(self, url, text, headers, seconds=0.0, entry=None):
+        """This function stores a downloaded page with the validators of its answer headers."""
+        raw = text.encode('utf-8')
+        body = zlib.compress(raw)
+        now = time.time()
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                    (url, body, headers.get('ETag'), headers.get('Last-Modified'), now, now, len(body),
+                                     seconds))
+        self.stats['changed' if entry is not None else 'misses'] += 1
+        self.stats['bytes_downloaded'] += len(raw)
+        self.total += len(body) - (entry['size'] if entry is not None else 0)
+        if self.total > self.max_bytes:
+            self.evict()
+        return text
+
+    def size(self):
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def evict(self):
+        """This function removes the least recently used pages until the cache fits in `max_bytes`."""
+        self.total = self.size()
+        excess = self.total - self.max_bytes
+        if excess <= 0:
+            return
+        removed = []
+        cursor = self.connection.execute("SELECT url, size FROM responses ORDER BY used_at")
+        for url, size in cursor:
+            if excess <= 0:
+                break
+            removed.append((url,))
+            excess -= size
+            self.total -= size
+        cursor.close()
+        with self.connection:
+            self.connection.executemany("DELETE FROM responses WHERE url = ?", removed)
+        self.stats['evictions'] += len(removed)
+
+    def summary(self):
+        """This function returns the hit/miss statistics, with the bandwidth and the download time saved."""
+        requests = self.stats['hits'] + self.stats['misses'] + self.stats['changed']
+        return {
+            'requests': requests,
+            'hits': self.stats['hits'],
+            'misses': self.stats['misses'],
+            'changed': self.stats['changed'],
+            'fresh': self.stats['fresh'],
+            'evictions': self.stats['evictions'],
+            'hit_rate': round(self.stats['hits'] / requests, 3) if requests else 0.0,
+            'mb_downloaded': round(self.stats['bytes_downloaded'] / 2 ** 20, 2),
+            'mb_saved': round(self.stats['bytes_saved'] / 2 ** 20, 2),
+            'seconds_saved': round(self.seconds_saved, 1),
+        }
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,237 @@
+from html.parser import HTMLParser
+from urllib.parse import parse_qs, parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+# Mapping between the output columns and the "data-attr-name" of the listing detail page
+DETAIL_FIELDS = {
+    'kamar_tidur': 'bedrooms',
+    'kamar_mandi': 'bathrooms',
+    'luas_bangunan': 'building_size',
+    'luas_tanah': 'land_size',
+}
+
+# Elements that never have a closing tag
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+
+class DetailPageParser(HTMLParser):
+    """This parser collects the value of every "data-attr-name" on a listing detail page.
+
+    It follows the same rule as the XPath used by the Selenium scraper
+    (//div[@data-attr-name = "..."]//following-sibling::div[contains(@class, "last")]):
+    the value is the text of the first "last" div that comes after the attribute div,
+    or after one of its descendants, under the same parent.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.attributes = {}
+        # Every frame is [tag, attribute names carried by the element, attribute names waiting for a "last" sibling]
+        self.stack = [[None, set(), set()]]
+        self.capturing = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        parent = self.stack[-1]
+
+        if tag == 'div' and 'last' in (attrs.get('class') or ''):
+            for name in parent[2]:
+                if name not in self.attributes:
+                    self.attributes[name] = []
+                    self.capturing.append((len(self.stack), name))
+
+        if tag in VOID_ELEMENTS:
+            return
+
+        carried = set(parent[1])
+        if attrs.get('data-attr-name'):
+            carried.add(attrs['data-attr-name'])
+        self.stack.append([tag, carried, set()])
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing elements can not hold a value, so they are never pushed on the stack
+        if tag not in VOID_ELEMENTS:
+            self.handle_starttag(tag, attrs)
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if not any(frame[0] == tag for frame in self.stack[1:]):
+            return
+        while len(self.stack) > 1:
+            frame = self.stack.pop()
+            self.capturing = [(depth, name) for depth, name in self.capturing if depth < len(self.stack)]
+            # The following siblings of this element are now candidates for its attribute names
+            self.stack[-1][2].update(frame[1])
+            if frame[0] == tag:
+                break
+
+    def handle_data(self, data):
+        for _, name in self.capturing:
+            self.attributes[name].append(data)
+
+
+def parse_detail_page(html):
+    """This function returns every "data-attr-name" of a listing detail page with its text value."""
+    parser = DetailPageParser()
+    parser.feed(html)
+    parser.close()
+    return {name: ' '.join(''.join(parts).split()) for name, parts in parser.attributes.items()}
+
+
+def detail_row(attributes):
+    """This function picks the output columns from the page attributes, missing values are replaced with "0"."""
+    return {column: attributes.get(name) or "0" for column, name in DETAIL_FIELDS.items()}
+
+
+class ListingPageParser(HTMLParser):
+    """This parser reads the elements the Selenium scraper looks up on the sitemap, province and city pages.
+
+    - provinces: //a[@class = "sitemap-link"]
+    - cities: //a[@class = "subLinks"]
+    - titles and links: //h3[@class = "ListingCell-KeyInfo-title"]
+    - addresses: //span[@class = "ListingCell-KeyInfo-address-text"]
+    - prices: //div[@class = "ListingCell-KeyInfo-price"]/div[1]
+    - next page: //div[@class = "next "]
+    - every other link, to read the page numbers of the pagination
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.provinces = []
+        self.cities = []
+        self.titles = []
+        self.links = []
+        self.addresses = []
+        self.prices = []
+        self.next_link = None
+        self.anchors = []
+        # Every frame is [tag, kind, text buffer or None, attributes]
+        self.stack = []
+
+    def _open(self, tag, attrs):
+        classes = (attrs.get('class') or '').split()
+        parent = self.stack[-1] if self.stack else None
+
+        if tag == 'a' and 'sitemap-link' in classes:
+            return 'province'
+        if tag == 'a' and 'subLinks' in classes:
+            return 'city'
+        if tag == 'h3' and 'ListingCell-KeyInfo-title' in classes:
+            return 'title'
+        if tag == 'span' and 'ListingCell-KeyInfo-address-text' in classes:
+            return 'address'
+        if tag == 'div' and 'ListingCell-KeyInfo-price' in classes:
+            return 'price_cell'
+        if tag == 'div' and parent is not None and parent[1] == 'price_cell' and not parent[3].get('seen'):
+            parent[3]['seen'] = True
+            return 'price'
+        if tag == 'div' and classes == ['next']:
+            return 'next'
+        return None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        kind = self._open(tag, attrs)
+        href = attrs.get('href')
+
+        if tag == 'a' and href:
+            self.anchors.append(href)
+            for frame in self.stack:
+                # The link of a listing is the first anchor inside its title
+                if frame[1] == 'title' and 'href' not in frame[3]:
+                    frame[3]['href'] = href
+                if frame[1] == 'next' and self.next_link is None:
+                    self.next_link = href
+
+        if tag in VOID_ELEMENTS:
+            return
+        frame_attrs = {'href': href} if href else {}
+        if kind == 'title':
+            # ... or the anchor around it
+            anchors = [frame[3]['href'] for frame in self.stack if frame[0] == 'a' and frame[3].get('href')]
+            frame_attrs = {'href': anchors[-1]} if anchors else {}
+        buffer = [] if kind in ('province', 'city', 'title', 'address', 'price') else None
+        self.stack.append([tag, kind, buffer, frame_attrs])
+
+    def handle_startendtag(self, tag, attrs):
+        if tag not in VOID_ELEMENTS:
+            self.handle_starttag(tag, attrs)
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if not any(frame[0] == tag for frame in self.stack):
+            return
+        while self.stack:
+            frame = self.stack.pop()
+            self._close(frame)
+            if frame[0] == tag:
+                break
+
+    def _close(self, frame):
+        tag, kind, buffer, attrs = frame
+        if buffer is None:
+            return
+        text = ' '.join(''.join(buffer).split())
+        if kind == 'province':
+            self.provinces.append(attrs.get('href'))
+        elif kind == 'city':
+            self.cities.append(attrs.get('href'))
+        elif kind == 'title':
+            self.titles.append(text)
+            self.links.append(attrs.get('href'))
+        elif kind == 'address':
+            self.addresses.append(text)
+        elif kind == 'price':
+            self.prices.append(text)
+
+    def handle_data(self, data):
+        for frame in self.stack:
+            if frame[2] is not None:
+                frame[2].append(data)
+
+
+def page_number(url):
+    """This function returns the number in the "page" parameter of a URL, or None when there is none."""
+    values = parse_qs(urlsplit(url).query).get('page')
+    return int(values[0]) if values and values[0].isdigit() else None
+
+
+def page_link(city_link, page):
+    """This function returns the link of a page of a city, the first page is the city link itself."""
+    if page == 1:
+        return city_link
+    parts = urlsplit(city_link)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key != 'page'] + [('page', str(page))]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def last_page_number(anchors, page_url):
+    """This function returns the highest page number linked from a page to the same path, or None.
+
+    The pagination of a city page links to its numbered pages (?page=2, ?page=3, ...) and to the
+    last one, so all the pages of a city are known after its first page.
+    """
+    path = urlsplit(page_url).path
+    numbers = [page_number(anchor) for anchor in anchors if urlsplit(anchor).path == path]
+    numbers = [number for number in numbers if number is not None]
+    return max(numbers + [page_number(page_url) or 1]) if numbers else None
+
+
+def parse_listing_page(html, page_url=''):
+    """This function parses a sitemap, province or city page, the links are made absolute with the page URL.
+
+    `last_page` is the highest page number of the pagination, None when the pages are not numbered
+    and have to be followed through `next_link`.
+    """
+    parser = ListingPageParser()
+    parser.feed(html)
+    parser.close()
+    absolute = lambda href: urljoin(page_url, href) if href else None
+    return {
+        'provinces': [absolute(href) for href in parser.provinces],
+        'cities': [absolute(href) for href in parser.cities],
+        'listings': [{'judul': judul, 'lokasi': lokasi, 'harga': harga, 'link': absolute(link)}
+                     for judul, lokasi, harga, link in zip(parser.titles, parser.addresses, parser.prices,
+                                                           parser.links)],
+        'next_link': absolute(parser.next_link),
+        'last_page': last_page_number([absolute(href) for href in parser.anchors], page_url),
+    }
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+from http_extractor import HttpDetailExtractor
+from page_parser import parse_listing_page, page_link
+
+
+# --- CONFIG ---
+link = 'put-your-link-in-here'
+
+# Limits of a recording, a handful of provinces and cities is enough to benchmark the scrapers
+max_provinces = 2
+max_cities = 3
+max_pages = 3
+
+
+def path_of(url):
+    """This function returns the path and query of a URL, which is the key of a page in the corpus."""
+    parts = urlsplit(url)
+    return (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+
+
+class Corpus:
+    """This class stores recorded pages in a directory, with a manifest.json that maps every path to its file."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.manifest_path = self.directory / "manifest.json"
+        if self.manifest_path.exists():
+            self.manifest = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+        else:
+            self.manifest = {'origin': None, 'start': None, 'max_pages': None, 'pages': {}}
+
+    def add(self, url, html):
+        parts = urlsplit(url)
+        self.manifest['origin'] = self.manifest['origin'] or f"{parts.scheme}://{parts.netloc}"
+        file_name = hashlib.sha1(path_of(url).encode('utf-8')).hexdigest() + ".html"
+        (self.directory / file_name).write_text(html, encoding='utf-8')
+        self.manifest['pages'][path_of(url)] = file_name
+
+    def get(self, path):
+        file_name = self.manifest['pages'].get(path)
+        return None if file_name is None else (self.directory / file_name).read_bytes()
+
+    def save(self):
+        self.manifest_path.write_text(json.dumps(self.manifest, indent=1), encoding='utf-8')
+
+
+def record(start_link, directory, max_provinces=max_provinces, max_cities=max_cities, max_pages=max_pages):
+    """This function downloads the sitemap, province, city and property's pages once and stores them in a corpus.
+
+    The pages of a city are recorded the way the crawlers request them: a numbered pagination through
+    page_link(), up to `max_pages`, otherwise through the "next" links. The cities have more pages than
+    that, so `max_pages` is saved in the manifest, and the benchmark stops the crawlers at that page.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    corpus = Corpus(directory)
+    corpus.manifest['start'] = path_of(start_link)
+    corpus.manifest['max_pages'] = max_pages
+
+    with HttpDetailExtractor() as extractor:
+        def fetch(url):
+            html = extractor.fetch(url)
+            corpus.add(url, html)
+            return parse_listing_page(html, url)
+
+        for province_link in fetch(start_link)['provinces'][:max_provinces]:
+            for city_link in fetch(province_link)['cities'][:max_cities]:
+                pages = [fetch(city_link)]
+                last_page = pages[0]['last_page']
+                while len(pages) < max_pages:
+                    if last_page is not None and last_page > len(pages):
+                        # A pagination that only shows the pages around the current one is extended as it goes
+                        pages.append(fetch(page_link(city_link, len(pages) + 1)))
+                        last_page = max(last_page, pages[-1]['last_page'] or 0)
+                    elif last_page is None and pages[-1]['next_link']:
+                        pages.append(fetch(pages[-1]['next_link']))
+                    else:
+                        break
+                for page in pages:
+                    for listing in page['listings']:
+                        corpus.add(listing['link'], extractor.fetch(listing['link']))
+                print(f"Recorded {city_link}: {len(pages)} pages")
+
+    corpus.save()
+    return corpus
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """This handler answers every request with the recorded page, links to the origin point to the local server."""
+
+    def do_GET(self):
+        body = self.server.corpus.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        # The ETag lets the HTTP cache of the scrapers revalidate the recorded pages
+        etag = '"' + self.server.corpus.manifest['pages'][self.path].split('.')[0] + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        body = body.replace(self.server.corpus.manifest['origin'].encode('utf-8'), self.server.base_url.encode('utf-8'))
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_corpus(directory, latency=0.0):
+    """This function serves a corpus on a free local port and returns the server and the local start link.
+
+    `latency` (in seconds) is added to every answer to imitate the network. The server runs in
+    a daemon thread, call server.shutdown() when you are done with it.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ReplayHandler)
+    server.daemon_threads = True
+    server.corpus = Corpus(directory)
+    server.latency = latency
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.base_url + server.corpus.manifest['start']
+
+
+# --- SYNTHETIC CORPUS ---
+SYNTHETIC_ORIGIN = "https://www.rumah.example"
+
+LISTING_CELL = """    <div class="ListingCell-AllInfo">
+        <h3 class="ListingCell-KeyInfo-title"><a href="{link}" target="_blank">{judul}</a></h3>
+        <div class="ListingCell-KeyInfo-address">
+            <span class="ListingCell-KeyInfo-address-text">{lokasi}</span>
+        </div>
+        <div class="ListingCell-KeyInfo-price">
+            <div class="PriceSection-FirstPrice">{harga}</div>
+        </div>
+    </div>
+"""
+
+DETAIL_ATTRIBUTE = """        <div class="columns-2">
+            <div class="ellipsis" data-attr-name="{name}">{label}</div>
+            <div class="last">{value}</div>
+        </div>
+"""
+
+
+def page_html(title, body):
+    return f"<!DOCTYPE html>\n<html lang=\"id\">\n<head><meta charset=\"utf-8\"><title>{title}</title></head>\n<body>\n{body}</body>\n</html>\n"
+
+
+def build_synthetic_corpus(directory, provinces=2, cities=3, pages=5, listings=20, seed=28):
+    """This function writes a corpus of generated pages with the markup of the real site.
+
+    It makes it possible to benchmark the scrapers on a machine without network access. Some
+    property's pages miss fields, and some titles contain a ";", like on the real site.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    corpus = Corpus(directory)
+    corpus.manifest['start'] = '/sitemap'
+    generator = random.Random(seed)
+    listing_id = 0
+
+    province_links = [f"{SYNTHETIC_ORIGIN}/jual/provinsi-{p}" for p in range(provinces)]
+    corpus.add(f"{SYNTHETIC_ORIGIN}/sitemap", page_html("Sitemap", "".join(
+        f'<a class="sitemap-link" href="{province_link}">Provinsi {p}</a>\n' for p, province_link in enumerate(province_links))))
+
+    for p, province_link in enumerate(province_links):
+        city_links = [f"{province_link}/kota-{c}" for c in range(cities)]
+        corpus.add(province_link, page_html(f"Provinsi {p}", '<a class="CrosslinkFilter-dropdown icon-dropdown-closed" href="#">Kota</a>\n' + "".join(
+            f'<a class="subLinks" href="{city_link}">Kota {p}-{c}</a>\n' for c, city_link in enumerate(city_links))))
+
+        for c, city_link in enumerate(city_links):
+            for page in range(1, pages + 1):
+                cells = []
+                for _ in range(listings):
+                    listing_id += 1
+                    detail_link = f"{SYNTHETIC_ORIGIN}/properti/{listing_id}"
+                    separator = '; ' if listing_id % 7 == 0 else ' '
+                    cells.append(LISTING_CELL.format(link=detail_link, judul=f"Rumah {listing_id}{separator}Siap Huni",
+                                                     lokasi=f"Kecamatan {c}, Kota {p}-{c}",
+                                                     harga=f"Rp {generator.randint(200, 5000)}.000.000"))
+                    attributes = {'bedrooms': ('Kamar Tidur', generator.randint(1, 6)),
+                                  'bathrooms': ('Kamar Mandi', generator.randint(1, 4)),
+                                  'building_size': ('Luas Bangunan', f"{generator.randint(30, 400)} m<sup>2</sup>"),
+                                  'land_size': ('Luas Tanah', f"{generator.randint(60, 800)} m<sup>2</sup>")}
+                    if listing_id % 5 == 0:
+                        del attributes['land_size']
+                    corpus.add(detail_link, page_html(f"Rumah {listing_id}", '<div class="Overview-main">\n' + "".join(
+                        DETAIL_ATTRIBUTE.format(name=name, label=label, value=value)
+                        for name, (label, value) in attributes.items()) + '</div>\n'))
+
+                # The numbered pagination only shows the pages around the current one, the crawlers have to extend it
+                pagination = '<div class="pagination">\n' + "".join(
+                    f'<a href="{city_link}?page={number}">{number}</a>\n'
+                    for number in range(max(1, page - 2), min(pages, page + 2) + 1)) + '</div>\n'
+                if page < pages:
+                    pagination += f'<div class="next "><a href="{city_link}?page={page + 1}">Selanjutnya</a></div>\n'
+                else:
+                    pagination += '<div class="next disabled">Selanjutnya</div>\n'
+                page_link = city_link if page == 1 else f"{city_link}?page={page}"
+                corpus.add(page_link, page_html(f"Kota {p}-{c}", "".join(cells) + pagination))
+
+    corpus.save()
+    return corpus
+
+
+if __name__ == "__main__":
+    # python replay.py record <corpus directory> [sitemap link]
+    # python replay.py synthetic <corpus directory>
+    # python replay.py serve <corpus directory>
+    command, directory = sys.argv[1], sys.argv[2]
+    if command == "record":
+        record(sys.argv[3] if len(sys.argv) > 3 else link, directory)
+    elif command == "synthetic":
+        build_synthetic_corpus(directory)
+    elif command == "serve":
+        server, start_link = serve_corpus(directory)
+        print(f"Serving {directory}, the sitemap is at {start_link} (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        raise SystemExit(f"Unknown command {command!r}, use record, synthetic or serve")
@@ -0,0 +1,81 @@
+import csv
+from pathlib import Path
+
+# Columns of the scraped files, in the order they are written
+COLUMNS = ['judul', 'lokasi', 'kamar_tidur', 'kamar_mandi', 'luas_bangunan', 'luas_tanah', 'harga']
+
+
+class RowWriter:
+    """This class buffers scraped rows and writes them in batches to a ";"-separated CSV file.
+
+    Values are quoted when they contain a ";", a quote or a line break, so a title can no longer
+    shift the columns of its row, and the file is written as strict UTF-8. With `part_format`
+    set to "parquet" or "feather", every batch is also saved as a part file in a
+    "{name}_parts" directory next to the CSV file.
+    """
+
+    def __init__(self, path, batch_size=500, append=False, part_format=None, on_flush=None):
+        if part_format not in (None, "parquet", "feather"):
+            raise ValueError(f"Unknown part format {part_format!r}, use 'parquet' or 'feather'")
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.part_format = part_format
+        self.on_flush = on_flush
+        self.rows = []
+        self.keys = []
+
+        write_header = not append or not self.path.exists() or self.path.stat().st_size == 0
+        self.file = open(self.path, "a" if append else "w", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.file, delimiter=';', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
+        if write_header:
+            self.writer.writerow(COLUMNS)
+
+        if part_format is not None:
+            self.parts_dir = self.path.with_name(f"{self.path.stem}_parts")
+            self.parts_dir.mkdir(exist_ok=True)
+            self.part_number = len(list(self.parts_dir.glob(f"part_*.{part_format}")))
+
+    def write(self, row, key=None):
+        """This function adds a row (a dict with the scraped columns) to the buffer.
+
+        The optional key is handed to `on_flush` once the row is on disk.
+        """
+        self.rows.append([row[column] for column in COLUMNS])
+        if key is not None:
+            self.keys.append(key)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """This function writes the buffered rows in one batch."""
+        if not self.rows:
+            return
+        self.writer.writerows(self.rows)
+        self.file.flush()
+        if self.part_format is not None:
+            self.write_part()
+        if self.on_flush is not None:
+            self.on_flush(self.keys)
+        self.rows = []
+        self.keys = []
+
+    def write_part(self):
+        import pandas as pd
+
+        part = pd.DataFrame(self.rows, columns=COLUMNS)
+        part_path = self.parts_dir / f"part_{self.part_number:05d}.{self.part_format}"
+        if self.part_format == "parquet":
+            part.to_parquet(part_path, index=False)
+        else:
+            part.to_feather(part_path)
+        self.part_number += 1
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
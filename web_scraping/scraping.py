@@ -1,4 +1,6 @@
-import logging
+import time
+from multiprocessing import Pool
+import requests
 from selenium import webdriver
 from selenium.webdriver import ActionChains
 from selenium.webdriver.chrome.service import Service
@@ -6,199 +8,383 @@ from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-
-
-
-# Initialize Chrome
-options = Options()
-options.add_experimental_option("detach", True)
-driver = webdriver.Chrome(service = Service(ChromeDriverManager().install())
-                          , options = options)
-
-# Open URL
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from http_extractor import HttpDetailExtractor
+from crawl_state import CrawlState
+from row_writer import RowWriter
+from fingerprint_index import FingerprintIndex
+from stage_timer import NULL_TIMER
+from page_parser import detail_row, parse_listing_page, page_link
+from crawl_logging import CrawlLogger
+
+
+# --- CONFIG ---
 link = 'put-your-link-in-here'
-driver.get(link)
-
-# Choosing Province
-provinces = driver.find_elements(By.XPATH, '//a[@class = "sitemap-link"]')
 
-for province in range(len(provinces)):
-    with open(f"house_scraping_pagination_{province}.csv", "w") as file:
-        file.write(
-            "judul; lokasi; kamar_tidur; kamar_mandi; luas_bangunan; luas_tanah; harga \n"
-        )
-
-    # Logging Config
-    logging.basicConfig(filename=f'logs_house_scraping_{province}.log'
-                        , format='%(asctime)s: %(levelname)s: %(message)s'
-                        , datefmt='%d/%m/%y %H:%M:%S'
-                        , level=logging.INFO
-                        , filemode='w')
-
-    # Maximize Windows
+# Number of independent Chrome sessions, each one scrapes a whole province at a time
+num_workers = 4
+
+# Engine used for the property's pages: "selenium" opens a browser window per listing,
+# "http" fetches the pages with a pooled requests session and parses the HTML
+engine = "selenium"
+
+# Property's pages of the previous crawls, only downloaded again by the "http" engine when they changed
+http_cache_path = "http_cache.sqlite"
+http_cache_max_mb = 512
+
+# Progress of the crawl, a restarted crawl skips everything that is already recorded in here
+crawl_state_path = "crawl_state.sqlite"
+
+# Fingerprints of every listing ever collected, kept across crawls so known listings are not opened again
+fingerprint_index_path = "fingerprint_index.sqlite"
+
+# Highest page of a city that is scraped, None scrapes every page. A recorded corpus only has the first pages
+max_pages = None
+
+# Seconds to wait for a property's page to load before its fields are read, a page without fields is
+# read as soon as it is loaded
+detail_wait_seconds = 3
+
+# Rows are buffered and written in batches, optionally also as "parquet" or "feather" part files
+batch_size = 500
+part_format = None
+
+
+# Collects every "data-attr-name" of the property's page with its value, following the same rule as
+# //div[@data-attr-name = "..."]//following-sibling::div[contains(@class, "last")]
+EXTRACT_ATTRIBUTES_SCRIPT = """
+const attributes = {};
+for (const element of document.querySelectorAll('div[data-attr-name]')) {
+    const name = element.getAttribute('data-attr-name');
+    if (name in attributes) continue;
+    for (const node of [element, ...element.querySelectorAll('*')]) {
+        let sibling = node.nextElementSibling;
+        while (sibling && !(sibling.tagName === 'DIV' && (sibling.getAttribute('class') || '').includes('last'))) {
+            sibling = sibling.nextElementSibling;
+        }
+        if (sibling) {
+            attributes[name] = sibling.innerText.split(/\\s+/).join(' ').trim();
+            break;
+        }
+    }
+}
+return attributes;
+"""
+
+# A property's page can be read once it is loaded, or as soon as its first field is there
+DETAIL_READY_SCRIPT = """
+return document.readyState === 'complete' || document.querySelector('div[data-attr-name]') !== null;
+"""
+
+
+def init_driver():
+    """This function opens a new Chrome session with a maximized window."""
+    options = Options()
+    options.add_experimental_option("detach", True)
+    driver = webdriver.Chrome(service = Service(ChromeDriverManager().install())
+                              , options = options)
     driver.maximize_window()
-    logging.info("Website was opened and the window was maximized successfully")
-    driver.implicitly_wait(10)
-
-    actions = ActionChains(driver)
-
-    actions.key_down(Keys.CONTROL).click(provinces[province]).key_up(Keys.CONTROL).perform()
-    logging.info("The province has been successfully selected.")
     driver.implicitly_wait(10)
-
-    # Switch to Province's Windows
-    province_windows = driver.window_handles[1]
-    driver.switch_to.window(province_windows)
-    logging.info("The transition to the Province's window was executed successfully.")
-    driver.implicitly_wait(10)
-
-    # Dropdown The City List
-    dropdown_button = driver.find_element(By.XPATH, '//a[@class = "CrosslinkFilter-dropdown icon-dropdown-closed"]')
-    dropdown_button.click()
-    logging.info("The dropdown button was clicked successfully")
-    driver.implicitly_wait(10)
-
-    # Choosing City
-    cities = driver.find_elements(By.XPATH, '//a[@class = "subLinks"]')
-
-    for city in range(len(cities)):
-        actions.key_down(Keys.CONTROL).click(cities[city]).key_up(Keys.CONTROL).perform()
-        logging.info("The city has been successfully selected.")
-        driver.implicitly_wait(10)
-
-        # Switch to City's Windows
-        city_windows = driver.window_handles[2]
-        driver.switch_to.window(city_windows)
-        logging.info("The transition to the city's window was executed successfully.")
-        driver.implicitly_wait(10)
-
-        pagination = True
-
-        while pagination:
-            with open(f"house_scraping_pagination_{province}.csv", "a", encoding="utf-8", errors='ignore') as file:
-                # Selecting House
-                houses = driver.find_elements(By.XPATH, '//h3[@class = "ListingCell-KeyInfo-title"]')
-                # Selecting Address
-                address = driver.find_elements(By.XPATH, '//span[@class = "ListingCell-KeyInfo-address-text"]')
-                # Selecting price
-                price = driver.find_elements(By.XPATH, '//div[@class = "ListingCell-KeyInfo-price"]/div[1]')
-                for i in range(len(houses)):
-                    # Extracting Title
-                    judul = houses[i].text
-                    logging.info("The title of the house was extracted successfully")
-
-                    # Extracting Location
-                    lokasi = address[i].text
-                    logging.info("The address of the house was extracted successfully")
-
-                    # Extracting Price
-                    harga = price[i].text
-                    logging.info("The price of the house was extracted successfully")
-
-                    # Choose the House
-                    houses[i].click()
-                    logging.info("The house on the list was selected successfully")
-                    driver.implicitly_wait(10)
-
-                    # Switch to Property's Windows
-                    property_windows = driver.window_handles[3]
-                    driver.switch_to.window(property_windows)
-                    logging.info("The transition to the property's window was executed successfully.")
-                    driver.implicitly_wait(10)
-
-                    # Extracting Amount of Bedrooms
-                    try:
-                        bedrooms = driver.find_element(By.XPATH, '//div[@data-attr-name = "bedrooms"]//following-sibling::div[contains(@class, "last")]')
-                        kamar_tidur = bedrooms.text
-                        logging.info("The amount of bedrooms in this house was extracted successfully")
-                        driver.implicitly_wait(10)
-                    except:
-                        kamar_tidur = "0"
-                        logging.info("There is no data on the number of bedrooms in this house, hence it is replaced with the digit 0.")
-                        driver.implicitly_wait(10)
-
-                    # Extracting Amount of Bathrooms
-                    try:
-                        bathrooms = driver.find_element(By.XPATH, '//div[@data-attr-name = "bathrooms"]//following-sibling::div[contains(@class, "last")]')
-                        kamar_mandi = bathrooms.text
-                        logging.info("The amount of bathrooms in this house was extracted successfully")
-                        driver.implicitly_wait(10)
-                    except:
-                        kamar_mandi = "0"
-                        logging.info("There is no data on the number of bathrooms in this house, hence it is replaced with the digit 0.")
-                        driver.implicitly_wait(10)
-
-                    # Extracting Building Size
-                    try:
-                        building_size = driver.find_element(By.XPATH, '//div[@data-attr-name = "building_size"]//following-sibling::div[contains(@class, "last")]')
-                        luas_bangunan = building_size.text
-                        logging.info("The building size in this house was extracted successfully")
-                        driver.implicitly_wait(10)
-                    except:
-                        luas_bangunan = "0"
-                        logging.info("There is no data on the building size of this house, hence it is replaced with the digit 0.")
-                        driver.implicitly_wait(10)
-
-                    # Extracting Land Size
-                    try:
-                        land_size = driver.find_element(By.XPATH,'//div[@data-attr-name = "land_size"]//following-sibling::div[contains(@class, "last")]')
-                        luas_tanah = land_size.text
-                        logging.info("The land size in this house was extracted successfully")
-                        driver.implicitly_wait(10)
-                    except:
-                        luas_tanah = "0"
-                        logging.info("There is no data on the land size of this house, hence it is replaced with the digit 0.")
-                        driver.implicitly_wait(10)
-
-                    # Close Property's Windows
-                    driver.close()
-                    logging.info("The property's window was closed successfully")
-                    driver.implicitly_wait(10)
-
-                    # Switch to City's Windows
-                    city_windows = driver.window_handles[2]
-                    driver.switch_to.window(city_windows)
-                    logging.info("The transition to the city's window was executed successfully.")
-                    driver.implicitly_wait(10)
-
-                    file.write(judul + ";" + lokasi + ";" + kamar_tidur + ";" + kamar_mandi + ";" + luas_bangunan + ";" + luas_tanah + ";" + harga + "\n")
-                    logging.info("The data has been inserted successfully into the file.")
-
-                try:
-                    # Click Next
-                    next_button = driver.find_element(By.XPATH, '//div[@class = "next "]')
-                    next_button.click()
-                    logging.info("The next button was clicked successfully")
-                    driver.implicitly_wait(10)
-                except:
-                    # Close City's Windows
-                    logging.info("No page left")
-                    driver.implicitly_wait(10)
-                    driver.close()
-                    logging.info("The city's window was closed successfully")
-                    driver.implicitly_wait(10)
-                    pagination = False
-
-        # Switch to Province's Windows
-        province_window = driver.window_handles[1]
-        driver.switch_to.window(province_window)
-        logging.info("The transition to the province's window was executed successfully.")
-        driver.implicitly_wait(10)
-
-    # Close Province's Windows
-    driver.close()
-    logging.info("The province's window was closed successfully")
-    driver.implicitly_wait(10)
-
-    # Switch to Parent's Windows
-    parent_window = driver.window_handles[0]
-    driver.switch_to.window(parent_window)
-    logging.info("The transition to the province's window was executed successfully.")
-    driver.implicitly_wait(10)
-
-file.close()
-logging.info("The Scraping Process is Done")
-
-# Close Parent Windows
-driver.close()
-print("Scraping is Done!!")
\ No newline at end of file
+    return driver
+
+
+def get_provinces():
+    """This function reads the sitemap and returns the link of every province."""
+    driver = init_driver()
+    driver.get(link)
+    provinces = driver.find_elements(By.XPATH, '//a[@class = "sitemap-link"]')
+    province_links = [province.get_attribute('href') for province in provinces]
+    driver.quit()
+    return province_links
+
+
+def listing_link(house):
+    """This function returns the link of the property's page behind a listing title."""
+    return house.find_element(By.XPATH, './/a[@href] | ./ancestor::a[@href]').get_attribute('href')
+
+
+def extract_details(driver):
+    """This function extracts the bedrooms, bathrooms, building size and land size from the property's window.
+
+    The new window is given up to detail_wait_seconds to load, then all "data-attr-name" values are
+    read with one script in a single round trip, so a missing field is replaced with "0" right away
+    instead of waiting out the implicit wait of every field.
+    """
+    try:
+        WebDriverWait(driver, detail_wait_seconds, poll_frequency=0.1).until(
+            lambda driver: driver.execute_script(DETAIL_READY_SCRIPT))
+    except TimeoutException:
+        # The fields that are there are still read, the missing ones are counted as "0"
+        pass
+    detail = detail_row(driver.execute_script(EXTRACT_ATTRIBUTES_SCRIPT))
+    return detail['kamar_tidur'], detail['kamar_mandi'], detail['luas_bangunan'], detail['luas_tanah']
+
+
+def close_other_windows(driver, keep):
+    """This function closes the windows that a failed city or house left open, and switches to the last one kept."""
+    for handle in driver.window_handles:
+        if handle not in keep:
+            driver.switch_to.window(handle)
+            driver.close()
+    driver.switch_to.window(keep[-1])
+
+
+def scrape_province(task, timer=NULL_TIMER):
+    """This function scrapes every city of one province with its own Chrome session.
+
+    It is executed by the worker processes, so everything it needs (driver, log and CSV file)
+    is created inside the function. It returns the province, the number of scraped houses, the
+    elapsed time and the error that stopped the province, or None, which are reported by the
+    coordinator. A house or a city that fails is logged and counted, and the others go on. The
+    optional timer records the duration of the navigation, extraction and write stages.
+    """
+    province, province_link = task
+    start_time = time.time()
+    total_houses = 0
+    failures = 0
+    error = None
+
+    # Logging Config, one JSON log file per province written by a background thread
+    logger = CrawlLogger(f'house_scraping_{province}', f'logs_house_scraping_{province}.log')
+    state = CrawlState(crawl_state_path)
+    fingerprints = FingerprintIndex(fingerprint_index_path)
+    driver = writer = http_extractor = None
+    try:
+        driver = init_driver()
+        logger.info("Website was opened and the window was maximized successfully", province=province)
+
+        # The houses are recorded in the crawl state once their batch is on disk
+        if state.has_started(province):
+            logger.info("The province was scraped partially before, resuming from the crawl state", province=province)
+
+        def record_listings(keys):
+            state.add_listings([key[:4] for key in keys])
+            fingerprints.add_many([(key[0], *key[4:]) for key in keys])
+
+        # The fingerprint index skips every house of the previous crawls, so the file is always appended to, also
+        # when a fresh crawl starts without crawl_state.sqlite: overwriting it would lose the houses collected before
+        writer = RowWriter(f"house_scraping_pagination_{province}.csv", batch_size=batch_size, append=True,
+                           part_format=part_format, on_flush=record_listings)
+
+        actions = ActionChains(driver)
+        http_extractor = HttpDetailExtractor(cache_path=http_cache_path if engine == "http" else None,
+                                             cache_max_bytes=http_cache_max_mb * 2 ** 20)
+
+        # Open Province's Page
+        with timer.stage('navigation'):
+            driver.get(province_link)
+        province_window = driver.current_window_handle
+
+        # Dropdown The City List
+        dropdown_button = driver.find_element(By.XPATH, '//a[@class = "CrosslinkFilter-dropdown icon-dropdown-closed"]')
+        dropdown_button.click()
+
+        # Choosing City
+        cities = driver.find_elements(By.XPATH, '//a[@class = "subLinks"]')
+
+        for city in range(len(cities)):
+            city_link = cities[city].get_attribute('href')
+            if state.is_city_done(province, city_link):
+                logger.count('cities_skipped')
+                continue
+
+            # A city that fails is logged and counted, and the next city starts from the province's window
+            city_failures = 0
+            try:
+                with timer.stage('navigation'):
+                    actions.key_down(Keys.CONTROL).click(cities[city]).key_up(Keys.CONTROL).perform()
+
+                # Switch to City's Windows
+                city_window = driver.window_handles[-1]
+                driver.switch_to.window(city_window)
+                logger.info("The city has been opened", stage='navigation', city=city_link)
+
+                # When the pagination is numbered, the first page tells how many pages the city has and the
+                # other pages are opened directly, so finished pages are not even loaded and the last page is
+                # known without waiting for the "next" button to be missing
+                last_page = parse_listing_page(driver.page_source, driver.current_url)['last_page']
+                page = 1
+
+                while True:
+                    page_done = state.is_page_done(province, city_link, page)
+                    if page > 1 and last_page is not None and not page_done:
+                        with timer.stage('navigation'):
+                            driver.get(page_link(city_link, page))
+
+                    # Selecting House, the listings of a finished page are skipped
+                    if page_done:
+                        houses = []
+                        logger.count('pages_skipped')
+                    else:
+                        houses = driver.find_elements(By.XPATH, '//h3[@class = "ListingCell-KeyInfo-title"]')
+                    # Selecting Address
+                    address = driver.find_elements(By.XPATH, '//span[@class = "ListingCell-KeyInfo-address-text"]')
+                    # Selecting price
+                    price = driver.find_elements(By.XPATH, '//div[@class = "ListingCell-KeyInfo-price"]/div[1]')
+                    page_failures = 0
+                    for i in range(len(houses)):
+                        # A house that fails is logged and counted, and the next one starts from the city's window
+                        try:
+                            # Skip the houses that were collected before the restart
+                            listing_url = listing_link(houses[i])
+                            if state.has_listing(listing_url):
+                                logger.count('listings_skipped')
+                                continue
+
+                            # Extracting Title, Location and Price
+                            judul = houses[i].text
+                            lokasi = address[i].text
+                            harga = price[i].text
+
+                            # Skip the houses that were already collected under another city, page or crawl
+                            if not fingerprints.claim(listing_url, judul, lokasi, harga):
+                                logger.count('listings_known')
+                                continue
+
+                            with timer.stage('extraction'):
+                                if engine == "http":
+                                    # Fetch the Property's Page over the pooled HTTP session
+                                    detail = http_extractor.extract(listing_url)
+                                    kamar_tidur = detail['kamar_tidur']
+                                    kamar_mandi = detail['kamar_mandi']
+                                    luas_bangunan = detail['luas_bangunan']
+                                    luas_tanah = detail['luas_tanah']
+                                else:
+                                    # Choose the House
+                                    houses[i].click()
+
+                                    # Switch to Property's Windows
+                                    property_window = driver.window_handles[-1]
+                                    driver.switch_to.window(property_window)
+
+                                    kamar_tidur, kamar_mandi, luas_bangunan, luas_tanah = extract_details(driver)
+
+                                    # Close Property's Windows and Switch to City's Windows
+                                    driver.close()
+                                    driver.switch_to.window(city_window)
+                        except (WebDriverException, requests.RequestException) as exception:
+                            # With the "http" engine, a connection error or an error status after the retries of
+                            # the session only costs this house, like in async_crawler.py
+                            logger.warning("The house could not be scraped", city=city_link, page=page,
+                                           error=f"{type(exception).__name__}: {exception}")
+                            logger.count('listings_failed')
+                            page_failures += 1
+                            close_other_windows(driver, [province_window, city_window])
+                            continue
+
+                        with timer.stage('write'):
+                            writer.write({'judul': judul, 'lokasi': lokasi, 'kamar_tidur': kamar_tidur,
+                                          'kamar_mandi': kamar_mandi, 'luas_bangunan': luas_bangunan,
+                                          'luas_tanah': luas_tanah, 'harga': harga},
+                                         key=(listing_url, province, city_link, page, judul, lokasi, harga))
+                        total_houses += 1
+                        logger.info("The house was extracted", stage='extraction', url=listing_url)
+                        logger.count('fields_missing', sum(value == "0" for value in
+                                                           (kamar_tidur, kamar_mandi, luas_bangunan, luas_tanah)))
+                        logger.count('listings_ok')
+
+                    # The page only counts as done once all of its rows are on disk, and a page with a failed house
+                    # is opened again by the next crawl, which skips the houses that were written
+                    with timer.stage('write'):
+                        writer.flush()
+                    if page_failures == 0:
+                        state.mark_page_done(province, city_link, page)
+                    city_failures += page_failures
+                    logger.count('pages')
+
+                    if max_pages is not None and page >= max_pages:
+                        break
+                    if last_page is not None:
+                        # A pagination that only shows the pages around the current one is extended as it goes. A
+                        # finished page is not loaded, unless it is the last known page of a resumed city: its
+                        # pagination tells whether pages after it are left
+                        if page_done and page >= last_page and page > 1:
+                            with timer.stage('navigation'):
+                                driver.get(page_link(city_link, page))
+                        if not page_done or page >= last_page:
+                            last_page = max(last_page, parse_listing_page(driver.page_source,
+                                                                          driver.current_url)['last_page'] or 0)
+                        if page >= last_page:
+                            break
+                        page += 1
+                    else:
+                        next_buttons = driver.find_elements(By.XPATH, '//div[@class = "next "]')
+                        if not next_buttons:
+                            break
+                        # Click Next
+                        with timer.stage('navigation'):
+                            next_buttons[0].click()
+                        page += 1
+            except WebDriverException as exception:
+                logger.warning("The city could not be scraped", city=city_link,
+                               error=f"{type(exception).__name__}: {exception}")
+                logger.count('cities_failed')
+                failures += 1
+                writer.flush()
+                close_other_windows(driver, [province_window])
+                continue
+
+            # No page left, Close City's Windows
+            driver.close()
+            if city_failures == 0:
+                state.mark_city_done(province, city_link)
+            failures += city_failures
+            logger.count('cities')
+            logger.info("The city is done", city=city_link, pages=page)
+
+            # Switch to Province's Windows
+            driver.switch_to.window(province_window)
+
+        # A province with failures is scraped again by the next crawl, which skips what was written
+        if failures == 0:
+            state.mark_province_done(province)
+    except Exception as exception:
+        # The coordinator reports the failed province and the other workers go on
+        error = f"{type(exception).__name__}: {exception}"
+        logger.warning("The province could not be scraped", province=province, error=error)
+        logger.count('provinces_failed')
+    finally:
+        # Close The Province's Session, the rows of the finished houses are written before
+        if writer is not None:
+            writer.close()
+        fingerprints.close()
+        state.close()
+        if http_extractor is not None:
+            logger.count('listings_missing', http_extractor.missing)
+            if http_extractor.cache is not None:
+                logger.info("HTTP cache statistics", cache=http_extractor.cache.summary())
+            http_extractor.close()
+        if driver is not None:
+            try:
+                driver.quit()
+            except WebDriverException:
+                # The session already crashed
+                pass
+        logger.close()
+
+    return province, total_houses, time.time() - start_time, error
+
+
+if __name__ == "__main__":
+    # Choosing Province
+    province_links = get_provinces()
+    state = CrawlState(crawl_state_path)
+    tasks = [(province, province_link) for province, province_link in enumerate(province_links)
+             if not state.is_province_done(province)]
+    state.close()
+    print(f"Found {len(province_links)} provinces, {len(province_links) - len(tasks)} already done, "
+          f"scraping {len(tasks)} of them with {num_workers} workers")
+
+    # Hand out the provinces to the workers and report the progress as soon as each one is finished
+    start_time = time.time()
+    total_houses = 0
+    with Pool(processes=num_workers) as pool:
+        for done, (province, houses, elapsed, error) in enumerate(pool.imap_unordered(scrape_province, tasks),
+                                                                  start=1):
+            total_houses += houses
+            status = "is done" if error is None else f"failed ({error})"
+            print(f"[{done}/{len(tasks)}] Province {province} {status}: {houses} houses in {elapsed:.0f} seconds "
+                  f"(total {total_houses} houses, {time.time() - start_time:.0f} seconds)")
+
+    print("Scraping is Done!!")
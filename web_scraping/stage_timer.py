@@ -0,0 +1,43 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """This class records how long every stage of the crawl (navigation, extraction, write) takes."""
+
+    def __init__(self):
+        self.durations = defaultdict(list)
+
+    @contextmanager
+    def stage(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name].append(time.perf_counter() - start_time)
+
+    def summary(self):
+        """This function returns the count, total, mean, median and 95th percentile (in ms) of every stage."""
+        summary = {}
+        for name, durations in self.durations.items():
+            durations = sorted(durations)
+            summary[name] = {
+                'count': len(durations),
+                'total_s': round(sum(durations), 4),
+                'mean_ms': round(sum(durations) / len(durations) * 1000, 3),
+                'p50_ms': round(durations[len(durations) // 2] * 1000, 3),
+                'p95_ms': round(durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000, 3),
+            }
+        return summary
+
+
+class NullTimer:
+    """This class has the same interface as StageTimer but records nothing, it is the default of the scrapers."""
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+
+NULL_TIMER = NullTimer()